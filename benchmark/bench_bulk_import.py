@@ -0,0 +1,87 @@
+"""
+批量导入导出耗时
+
+对比逐个添加服务并每次保存（添加服务命令的方式）与批量导入一次保存，以及全部冲突时的校验耗时与导出耗时
+
+python benchmark/bench_bulk_import.py [--count 10000] [--single-count 1000]
+"""
+
+import argparse
+import json
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.bulk import parse_entries, dump_entries
+from nonebot_plugin_servicestate.exception import ImportInvalidError
+
+
+def timeit(label: str, count: int, func) -> float:
+    start = time.perf_counter()
+    func()
+    cost = time.perf_counter() - start
+    print(f"{label:<28} total {cost * 1000:9.1f} ms | per service {cost / count * 1e6:8.2f} us")
+    return cost
+
+
+def build_entries(count: int):
+    entries = []
+    for i in range(count):
+        if i % 2:
+            entries.append({"protocol": "TCP", "name": f"tcp-{i}", "host": f"10.0.{i // 256 % 256}.{i % 256}", "port": 443})
+        else:
+            entries.append({"protocol": "HTTP", "name": f"http-{i}", "host": f"https://http-{i}.example/"})
+        if i % 10 == 0:
+            entries[-1]["group"] = f"group-{i // 100}"
+    return entries
+
+
+def reset() -> None:
+    manager.load_dict({"service": {}, "service_group": {}})
+    manager.save()
+
+
+def main(args: argparse.Namespace) -> None:
+    entries = build_entries(args.count)
+    json_text = json.dumps(entries)
+    csv_text = dump_entries(entries, "csv")
+
+    reset()
+
+    # 添加服务命令只能加入已有群组，逐个添加时只取独立服务
+    single_entries = [i for i in entries if "group" not in i][: args.single_count]
+
+    def one_by_one():
+        for entry in single_entries:
+            manager.bind_new_service(entry["protocol"], entry["name"], entry["host"])
+            manager.save()
+
+    single = timeit(f"one by one ({args.single_count})", args.single_count, one_by_one)
+    print(f"{'':<28} estimated for {args.count}: {single / args.single_count * args.count:.1f} s (grows with size)")
+
+    reset()
+    timeit("parse json", args.count, lambda: parse_entries(json_text))
+    timeit("parse csv", args.count, lambda: parse_entries(csv_text))
+    parsed = parse_entries(csv_text)
+    timeit("validate + apply (csv)", args.count, lambda: manager.import_services(parsed))
+    timeit("save", args.count, manager.save)
+
+    def conflicting():
+        try:
+            manager.import_services(parsed)
+        except ImportInvalidError as e:
+            assert len(e.args) == args.count
+
+    timeit("validate, all conflicting", args.count, conflicting)
+    timeit("export json", args.count, lambda: dump_entries(manager.export_entries(), "json"))
+    timeit("export csv", args.count, lambda: dump_entries(manager.export_entries(), "csv"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10000, help="批量导入的服务数量")
+    parser.add_argument("--single-count", type=int, default=1000, help="逐个添加的服务数量")
+    main(parser.parse_args())
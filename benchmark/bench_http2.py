@@ -0,0 +1,90 @@
+"""
+HTTPProtocol HTTP/2 多路复用：同一源下多个路径并发探测的耗时与连接数
+
+对比 HTTP/1.1 与 http2 模式，并检查服务器不支持 h2 时回退到 HTTP/1.1，需要安装 h2
+探测经过 CommandManager.get_detect_result，包括执行器默认的同一主机探测数量限制
+
+python benchmark/bench_http2.py [路径数量] [轮数]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot.log import logger
+
+from nonebot_plugin_servicestate.executor import probe_executor
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.protocol.http import client_pool
+from servers import HTTP2StandInServer, HTTPStandInServer, self_signed_context
+
+
+async def measure(label: str, services, rounds: int, server) -> None:
+    manager.load_dict({"service": {"HTTP": services}, "service_group": {}})
+    connection_before = server.connection_count
+    cost = []
+    stream_latency = []
+    versions = set()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        results = list((await manager.get_detect_result(force=True)).values())
+        cost.append((time.perf_counter() - start) * 1000)
+        assert all(results), results
+        stream_latency.extend(i.detail["stream_latency"] * 1000 for i in results)
+        versions.update(i.detail["http_version"] for i in results)
+    stream_latency.sort()
+    print(
+        f"{label:<10} round avg {statistics.mean(cost):8.2f} ms | "
+        f"stream p50 {stream_latency[len(stream_latency) // 2]:7.2f} ms "
+        f"p95 {stream_latency[int(len(stream_latency) * 0.95)]:7.2f} ms | "
+        f"{server.connection_count - connection_before:4} conns | {'/'.join(sorted(versions))}"
+    )
+
+
+async def main(count: int, rounds: int) -> None:
+    logger.remove()
+    client_pool.configure(max_connections=100, max_keepalive_connections=100, http2_max_streams=100)
+    # 使用默认的同一主机探测数量限制，探测结果不复用
+    probe_executor.configure(result_ttl=0)
+    h1_server = HTTPStandInServer(latency=0.02, ssl_context=self_signed_context(["http/1.1"]))
+    h2_server = HTTP2StandInServer(latency=0.02)
+    await h1_server.start()
+    await h2_server.start()
+    try:
+        await measure(
+            "http/1.1",
+            [{"name": f"h1-{i}", "host": f"{h1_server.url}{i}"} for i in range(count)],
+            rounds,
+            h1_server,
+        )
+        await measure(
+            "http2",
+            [{"name": f"h2-{i}", "host": f"{h2_server.url}{i}", "http2": True} for i in range(count)],
+            rounds,
+            h2_server,
+        )
+        print(f"http2 max concurrent streams on one connection: {h2_server.max_streams}")
+        await measure(
+            "fallback",
+            [{"name": f"fb-{i}", "host": f"{h1_server.url}{i}", "http2": True} for i in range(count)],
+            rounds,
+            h1_server,
+        )
+    finally:
+        await client_pool.aclose()
+        await h1_server.stop()
+        await h2_server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        )
+    )
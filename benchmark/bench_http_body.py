@@ -0,0 +1,105 @@
+"""
+HTTPProtocol.detect 响应体处理：不同请求方式下的单次探测延迟、传输量、连接数与内存峰值
+
+替身服务器返回 body_size 字节的 200 响应，对比改造前完整缓存响应体的 GET 与各探测选项
+替身服务器运行在子进程中，内存峰值只统计探测一侧
+
+python benchmark/bench_http_body.py [探测次数] [响应体字节数]
+"""
+
+import asyncio
+import multiprocessing
+import statistics
+import sys
+import time
+import tracemalloc
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot.log import logger
+
+from nonebot_plugin_servicestate.protocol.http import HTTPProtocol, client_pool
+from servers import HTTPStandInServer
+
+
+class BufferedGetProtocol(HTTPProtocol):
+    # 改造前的实现：完整读取并缓存响应体后只检查状态码
+    _PROTOCOL_NAME = "BENCH_BUFFERED_HTTP"
+
+    async def detect(self) -> bool:
+        respond = await client_pool.get(self.proxies, False).get(url=self.host, timeout=self.timeout)
+        return respond.status_code == 200
+
+
+async def measure(label: str, service: HTTPProtocol, count: int, conn) -> None:
+    conn.send("reset")
+    conn.recv()
+    cost = []
+    probe_peak = 0
+    tracemalloc.start()
+    for _ in range(count):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        assert await service.detect()
+        cost.append((time.perf_counter() - start) * 1000)
+        probe_peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    conn.send("stats")
+    bytes_sent, connection_count = conn.recv()
+    cost.sort()
+    print(
+        f"{label:<10} p50 {cost[len(cost) // 2]:7.3f} ms | avg {statistics.mean(cost):7.3f} ms | "
+        f"{bytes_sent / count / 1024:8.1f} KiB/probe sent | {connection_count:4} conns | "
+        f"peak {probe_peak / count / 1024:8.1f} KiB/probe"
+    )
+
+
+def run_server(conn, body_size: int) -> None:
+    async def serve() -> None:
+        server = HTTPStandInServer(body_size=body_size)
+        await server.start()
+        conn.send(server.url)
+        loop = asyncio.get_event_loop()
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command == "reset":
+                server.bytes_sent = 0
+                server.connection_count = 0
+                conn.send(None)
+            else:
+                conn.send((server.bytes_sent, server.connection_count))
+
+    asyncio.run(serve())
+
+
+async def main(count: int, body_size: int) -> None:
+    logger.remove()
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=run_server, args=(child_conn, body_size), daemon=True)
+    server.start()
+    url = parent_conn.recv()
+    cases = [
+        ("buffered", BufferedGetProtocol(name="buffered", host=url)),
+        ("get", HTTPProtocol(name="get", host=url)),
+        ("stream", HTTPProtocol(name="stream", host=url, stream=True)),
+        ("head", HTTPProtocol(name="head", host=url, method="HEAD")),
+        ("keyword", HTTPProtocol(name="keyword", host=url, keyword="OK", keyword_max_bytes=1024)),
+    ]
+    try:
+        for label, service in cases:
+            await measure(label, service, count, parent_conn)
+    finally:
+        await client_pool.aclose()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+            int(sys.argv[2]) if len(sys.argv) > 2 else 1024 * 1024,
+        )
+    )
@@ -0,0 +1,65 @@
+"""
+HTTPProtocol.detect 单次探测延迟：每次新建 AsyncClient 与共享连接池对比
+
+python benchmark/bench_http_client.py [探测次数]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from httpx import AsyncClient
+
+from nonebot_plugin_servicestate.protocol.http import HTTPProtocol, client_pool
+from servers import HTTPStandInServer
+
+
+async def fresh_client_detect(url: str) -> bool:
+    # 改造前的实现：每次探测新建客户端
+    async with AsyncClient(verify=False, follow_redirects=True, timeout=2) as client:
+        respond = await client.get(url=url)
+        return respond.status_code == 200
+
+
+async def measure(probe, count: int):
+    cost = []
+    for _ in range(count):
+        start = time.perf_counter()
+        assert await probe()
+        cost.append((time.perf_counter() - start) * 1000)
+    return cost
+
+
+def summary(label: str, cost) -> None:
+    cost = sorted(cost)
+    print(
+        f"{label:<8} avg {statistics.mean(cost):7.3f} ms | "
+        f"p50 {cost[len(cost) // 2]:7.3f} ms | "
+        f"p95 {cost[int(len(cost) * 0.95)]:7.3f} ms"
+    )
+
+
+async def main(count: int) -> None:
+    server = HTTPStandInServer()
+    await server.start()
+    service = HTTPProtocol(name="bench", host=server.url)
+    try:
+        before = await measure(lambda: fresh_client_detect(server.url), count)
+        before_connection = server.connection_count
+        after = await measure(service.detect, count)
+        after_connection = server.connection_count - before_connection
+    finally:
+        await client_pool.aclose()
+        await server.stop()
+    summary("before", before)
+    summary("after", after)
+    print(f"connections: before {before_connection} | after {after_connection}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
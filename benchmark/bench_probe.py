@@ -0,0 +1,203 @@
+"""
+端到端探测基准测试
+
+在本地启动 HTTP / TCP 替身服务器，按比例生成正常、失败与黑洞服务，测量 CommandManager.get_detect_result
+在不同服务数量下的吞吐量与尾延迟，以及大配置的载入、保存耗时，结果以 JSON 输出
+TCP 服务共用少数几个替身端口，默认按服务名称区分探测目标，使每个服务都实际探测一次，--coalesce 时保留合并
+
+python benchmark/bench_probe.py [--sizes 10,100,1000,10000] [--output result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from nonebot.log import logger
+
+from utils import init_nonebot
+
+# 结果输出到标准输出，日志只保留警告并改到标准错误，同时避免逐条探测日志影响测量
+logger.remove()
+logger.add(sys.stderr, level="WARNING")
+
+init_nonebot()
+
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.executor import probe_executor
+from nonebot_plugin_servicestate.history import percentile
+from nonebot_plugin_servicestate.protocol.http import client_pool
+from servers import BlackHoleTCPServer, HTTPStandInServer, TCPStandInServer, closed_port
+
+
+def build_config(args: argparse.Namespace, count: int, targets: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    生成 count 个服务的配置，group_ratio 比例的服务按 group_size 个一组放入群组
+    """
+    rng = random.Random(args.seed)
+
+    def service(name: str) -> Tuple[str, Dict[str, Any]]:
+        roll = rng.random()
+        kind = "hole" if roll < args.blackhole_rate else "fail" if roll < args.blackhole_rate + args.failure_rate else "ok"
+        if rng.random() < args.tcp_ratio:
+            host, port = targets[f"tcp_{kind}"]
+            return "TCP", {"name": name, "host": host, "port": port, "timeout": args.timeout, "interval": 60}
+        url = f"{targets['http']}{kind}/{name}"
+        return "HTTP", {"name": name, "host": url, "timeout": args.timeout, "interval": 60, "proxies": None}
+
+    single: Dict[str, List[Dict[str, Any]]] = {"HTTP": [], "TCP": []}
+    groups: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    group_count = int(count * args.group_ratio) // args.group_size if args.group_size > 0 else 0
+    index = 0
+    for g in range(group_count):
+        members: Dict[str, List[Dict[str, Any]]] = {"HTTP": [], "TCP": []}
+        for _ in range(args.group_size):
+            protocol, config = service(f"service-{index}")
+            members[protocol].append(config)
+            index += 1
+        groups[f"group-{g}"] = members
+    while index < count:
+        protocol, config = service(f"service-{index}")
+        single[protocol].append(config)
+        index += 1
+    return {"service": single, "service_group": groups}
+
+
+def summary(values: List[float]) -> Dict[str, Any]:
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+async def bench_probe(args: argparse.Namespace, count: int, targets: Dict[str, Any]) -> Dict[str, Any]:
+    manager.load_dict(build_config(args, count, targets))
+    # 预热：建立连接池中的长连接
+    await manager.get_detect_result(force=True)
+    probe_executor.stats.reset()
+    rounds = []
+    completion: List[float] = []
+    failed = 0
+    for _ in range(args.rounds):
+        wall_start = time.time()
+        start = time.perf_counter()
+        result = await manager.get_detect_result(force=True)
+        cost = time.perf_counter() - start
+        rounds.append(cost)
+        for i in result.values():
+            if not i:
+                failed += 1
+            if i.timestamp is not None and i.latency is not None:
+                # 自本轮开始到该结果完成的时间，包含排队等待
+                completion.append(max(0.0, i.timestamp + i.latency - wall_start))
+    stats = probe_executor.stats
+    return {
+        "services": count,
+        "results_per_round": len(result),
+        "rounds": args.rounds,
+        "round_ms": summary(rounds),
+        "throughput_per_s": round(stats.count / sum(rounds), 1) if sum(rounds) else None,
+        "result_completion": summary(completion),
+        "failed_results": failed,
+        "probes": stats.count,
+        "coalesced": stats.coalesced,
+        "queue_wait_avg_ms": round(stats.queue_wait_avg * 1000, 3),
+        "queue_wait_max_ms": round(stats.queue_wait_max * 1000, 3),
+        "probe_time_avg_ms": round(stats.probe_time_avg * 1000, 3),
+        "probe_time_max_ms": round(stats.probe_time_max * 1000, 3),
+    }
+
+
+def bench_persistence(args: argparse.Namespace, count: int, targets: Dict[str, Any]) -> Dict[str, Any]:
+    path = Path(tempfile.mkdtemp(prefix="servicestate-bench-")) / "protocol_settings.json"
+    manager.load_dict(build_config(args, count, targets))
+    start = time.perf_counter()
+    manager.save(path)
+    save_cost = time.perf_counter() - start
+    start = time.perf_counter()
+    manager.load(path)
+    load_cost = time.perf_counter() - start
+    return {
+        "services": count,
+        "file_bytes": path.stat().st_size,
+        "save_ms": round(save_cost * 1000, 3),
+        "load_ms": round(load_cost * 1000, 3),
+    }
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    probe_executor.configure(args.max_concurrency, args.max_per_host, args.result_ttl)
+    if not args.coalesce:
+        # 替身服务器的端口有限，不同服务的 TCP 探测目标相同，按名称区分以免被合并为一次探测
+        probe_executor.target_key = lambda service: service._PROTOCOL_NAME + service.name
+    client_pool.configure(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    http_server = HTTPStandInServer(latency=args.latency)
+    tcp_server = TCPStandInServer()
+    black_hole = BlackHoleTCPServer()
+    await http_server.start()
+    await tcp_server.start()
+    black_hole.start()
+    targets = {
+        "http": http_server.url,
+        "tcp_ok": ("127.0.0.1", tcp_server.port),
+        "tcp_fail": ("127.0.0.1", closed_port()),
+        "tcp_hole": ("127.0.0.1", black_hole.port),
+    }
+    report: Dict[str, Any] = {"parameters": vars(args), "probe": [], "persistence": []}
+    try:
+        for count in args.sizes:
+            print(f"probing {count} services", file=sys.stderr)
+            report["probe"].append(await bench_probe(args, count, targets))
+        for count in args.persistence_sizes:
+            report["persistence"].append(bench_persistence(args, count, targets))
+    finally:
+        await client_pool.aclose()
+        await http_server.stop()
+        await tcp_server.stop()
+        black_hole.stop()
+    report["http_connections"] = http_server.connection_count
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    def int_list(value: str) -> List[int]:
+        return [int(i) for i in value.split(",") if i]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int_list, default=[10, 100, 1000, 10000], help="探测的服务数量")
+    parser.add_argument("--persistence-sizes", type=int_list, default=[1000, 10000, 50000], help="载入保存的服务数量")
+    parser.add_argument("--rounds", type=int, default=3, help="每个数量的探测轮数")
+    parser.add_argument("--latency", type=float, default=0.005, help="替身服务器响应延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="返回失败的服务比例")
+    parser.add_argument("--blackhole-rate", type=float, default=0.01, help="不响应直至超时的服务比例")
+    parser.add_argument("--tcp-ratio", type=float, default=0.5, help="TCP 服务比例，其余为 HTTP")
+    parser.add_argument("--group-ratio", type=float, default=0.2, help="放入群组的服务比例")
+    parser.add_argument("--group-size", type=int, default=5, help="每个群组的服务数量")
+    parser.add_argument("--timeout", type=float, default=1, help="服务超时参数（秒）")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="同时进行的探测数量上限")
+    parser.add_argument("--max-per-host", type=int, default=0, help="对同一主机同时进行的探测数量上限，替身服务器均在本机")
+    parser.add_argument("--result-ttl", type=float, default=0, help="探测结果复用时间（秒），默认每轮都重新探测")
+    parser.add_argument("--coalesce", action="store_true", help="合并目标相同的 TCP 探测，默认每个服务单独探测")
+    parser.add_argument("--max-connections", type=int, default=100, help="HTTP 连接池上限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None, help="结果写入的文件，默认输出到标准输出")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = json.dumps(asyncio.run(main(args)), ensure_ascii=False, indent=2, default=str)
+    if args.output is None:
+        print(report)
+    else:
+        args.output.write_text(report, encoding="utf-8")
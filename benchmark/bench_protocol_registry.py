@@ -0,0 +1,54 @@
+"""
+协议登记与发现耗时
+
+定义大量协议子类的登记耗时（与原先每次定义子类都扫描全部子类的方式对比），以及入口点扫描与获取协议名称的耗时
+
+python benchmark/bench_protocol_registry.py [协议数量]
+"""
+
+import sys
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot_plugin_servicestate.protocol import BaseProtocol, SupportProtocol
+
+
+def define(count: int, prefix: str) -> None:
+    for i in range(count):
+        type(f"{prefix}{i}", (BaseProtocol,), {"_PROTOCOL_NAME": f"{prefix}{i}", "detect": lambda self: True})
+
+
+def legacy_scan() -> None:
+    # 原先的登记方式：每次定义子类都遍历全部直接子类
+    for subclass in BaseProtocol.__subclasses__():
+        if subclass._PROTOCOL_NAME not in SupportProtocol.SUPPORT_PROTOCOL:
+            SupportProtocol.SUPPORT_PROTOCOL[subclass._PROTOCOL_NAME] = subclass
+
+
+def main(count: int) -> None:
+    start = time.perf_counter()
+    SupportProtocol.discover()
+    print(f"{'entry point scan':<28} {(time.perf_counter() - start) * 1000:9.2f} ms")
+
+    start = time.perf_counter()
+    define(count, "Registered")
+    cost = time.perf_counter() - start
+    print(f"{'define + register':<28} {cost * 1000:9.2f} ms | per protocol {cost / count * 1e6:8.2f} us")
+
+    start = time.perf_counter()
+    for _ in range(count):
+        legacy_scan()
+    cost = time.perf_counter() - start
+    print(f"{'legacy scan per definition':<28} {cost * 1000:9.2f} ms | per protocol {cost / count * 1e6:8.2f} us")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        SupportProtocol.get()
+    print(f"{'get protocol names':<28} {(time.perf_counter() - start) * 1000:9.2f} us per call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
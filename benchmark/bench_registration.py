@@ -0,0 +1,52 @@
+"""
+大量服务注册、分组与冲突检查耗时
+
+python benchmark/bench_registration.py [服务数量]
+"""
+
+import sys
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.exception import NameConflictError
+
+
+def timeit(label: str, count: int, func) -> None:
+    start = time.perf_counter()
+    func()
+    cost = time.perf_counter() - start
+    print(f"{label:<24} total {cost * 1000:9.1f} ms | per op {cost / count * 1e6:8.2f} us")
+
+
+def main(count: int) -> None:
+    def register():
+        for i in range(count):
+            manager.bind_new_service("TCP", f"service-{i}", "127.0.0.1")
+
+    def conflict():
+        for i in range(count):
+            try:
+                manager.bind_new_service("TCP", f"service-{i}", "127.0.0.1")
+            except NameConflictError:
+                pass
+
+    def group():
+        for i in range(0, count, 10):
+            manager.bind_group_by_name([f"service-{j}" for j in range(i, i + 5)], f"group-{i}")
+
+    def unregister():
+        for key, _ in list(manager.iter_services()):
+            manager.unbind_service_by_name(key[1] if key[0] is None else list(key))
+
+    timeit("register", count, register)
+    timeit("conflict check", count, conflict)
+    timeit("group (5 per group)", count // 10, group)
+    timeit("unregister", count, unregister)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
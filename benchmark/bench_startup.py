@@ -0,0 +1,128 @@
+"""
+插件导入与启动耗时
+
+每个测量在新的子进程中进行：导入插件的耗时、启动时在线程池中载入配置的耗时（事件循环被阻塞的最长时间）、
+首次完整使用（创建所有服务的数据模型）的耗时，以及载入后是否导入了 httpx
+
+python benchmark/bench_startup.py [--sizes 0,1000,10000,50000] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def build_config(count: int, tcp_only: bool) -> Dict[str, Any]:
+    service: Dict[str, List[Dict[str, Any]]] = {"HTTP": [], "TCP": []}
+    for i in range(count):
+        if tcp_only or i % 2:
+            service["TCP"].append({"name": f"tcp-{i}", "host": f"tcp-{i}.example", "port": 80, "interval": 60})
+        else:
+            service["HTTP"].append({"name": f"http-{i}", "host": f"https://http-{i}.example/", "interval": 60})
+    return {"service": service, "service_group": {}}
+
+
+async def max_loop_block(coroutine) -> float:
+    """
+    执行 coroutine，返回期间事件循环单次被阻塞的最长时间（秒）
+    """
+    longest = 0.0
+    done = False
+
+    async def ticker() -> None:
+        nonlocal longest
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+
+    task = asyncio.ensure_future(ticker())
+    await coroutine
+    done = True
+    await task
+    return longest
+
+
+def child(config_path: str) -> None:
+    from utils import init_nonebot
+
+    init_nonebot()
+    import nonebot
+    from nonebot.log import logger
+
+    logger.remove()
+    nonebot.require("nonebot_plugin_localstore")
+    import nonebot_plugin_localstore as store
+
+    target = Path(store.get_data_file("nonebot-plugin-servicestate", "protocol_settings.json"))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(config_path, target)
+
+    start = time.perf_counter()
+    nonebot.load_plugin("nonebot_plugin_servicestate")
+    import_time = time.perf_counter() - start
+
+    from nonebot_plugin_servicestate.manager import manager
+
+    async def startup() -> Dict[str, float]:
+        start = time.perf_counter()
+        block = await max_loop_block(manager.load_async())
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _, service in manager.iter_services():
+            service.interval
+        return {"load": load_time, "block": block, "materialize": time.perf_counter() - start}
+
+    result = asyncio.run(startup())
+    result.update(import_time=import_time, httpx="httpx" in sys.modules)
+    print(json.dumps(result))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="0,1000,10000,50000", help="服务数量，以逗号分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取中位数")
+    args = parser.parse_args()
+    directory = Path(tempfile.mkdtemp(prefix="servicestate-startup-"))
+    print(f"{'services':>8} {'config':<8} {'import':>9} {'load':>9} {'loop block':>10} {'first use':>10}  httpx")
+    for size in (int(i) for i in args.sizes.split(",")):
+        for tcp_only in (True, False):
+            config_path = directory / f"{size}-{tcp_only}.json"
+            config_path.write_text(json.dumps(build_config(size, tcp_only)), encoding="utf-8")
+            runs = []
+            for _ in range(args.repeat):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", str(config_path)],
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+
+            def median(key: str) -> float:
+                return statistics.median(i[key] for i in runs) * 1000
+
+            print(
+                f"{size:>8} {'tcp' if tcp_only else 'mixed':<8} {median('import_time'):7.1f}ms "
+                f"{median('load'):7.1f}ms {median('block'):8.1f}ms {median('materialize'):8.1f}ms  {runs[0]['httpx']}"
+            )
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+    else:
+        main()
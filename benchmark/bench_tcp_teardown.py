@@ -0,0 +1,94 @@
+"""
+TCPProtocol.detect 连接回收：文件描述符数量与单次探测内存分配
+
+对比改造前不关闭连接的实现、关闭连接的实现与 half_open 模式，替身服务器运行在子进程中，不计入统计
+Python 3.11 起 StreamWriter 被回收时会关闭连接，改造前的实现在更早的版本中 fd 会持续增加直至 GC
+
+python benchmark/bench_tcp_teardown.py [探测次数]
+"""
+
+import asyncio
+import gc
+import multiprocessing
+import os
+import sys
+import tracemalloc
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot.log import logger
+
+from nonebot_plugin_servicestate.protocol.tcp import TCPProtocol
+from servers import TCPStandInServer
+
+
+async def leaky_detect(service: TCPProtocol) -> bool:
+    # 改造前的实现：连接建立后不关闭 writer
+    try:
+        await asyncio.wait_for(asyncio.open_connection(service.host, service.port), service.timeout)
+    except Exception:
+        return False
+    return True
+
+
+async def closing_detect(service: TCPProtocol) -> bool:
+    return bool(await service.detect())
+
+
+def fd_count() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+async def measure(label: str, detect, service: TCPProtocol, count: int) -> None:
+    gc.collect()
+    fd_before = fd_count()
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    probe_peak = 0
+    for _ in range(count):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        assert await detect(service)
+        probe_peak += tracemalloc.get_traced_memory()[1] - current
+    # 让服务器一侧处理完对端关闭
+    await asyncio.sleep(0.1)
+    fd_after = fd_count()
+    snapshot_after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(i.size_diff for i in snapshot_after.compare_to(snapshot_before, "filename"))
+    gc.collect()
+    await asyncio.sleep(0.1)
+    print(
+        f"{label:<10} fd +{fd_after - fd_before:<5} (after gc +{fd_count() - fd_before:<4}) | "
+        f"peak {probe_peak / count:8.0f} B/probe | retained {retained / count:6.0f} B/probe"
+    )
+
+
+def run_server(conn) -> None:
+    async def serve() -> None:
+        server = TCPStandInServer()
+        conn.send(await server.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def main(count: int) -> None:
+    # 日志格式化的分配远大于连接本身，测量时关闭
+    logger.remove()
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=run_server, args=(child_conn,), daemon=True)
+    server.start()
+    host, port = parent_conn.recv()
+    await measure("leaky", leaky_detect, TCPProtocol(name="leaky", host=host, port=port), count)
+    await measure("closing", closing_detect, TCPProtocol(name="closing", host=host, port=port), count)
+    await measure(
+        "half_open", closing_detect, TCPProtocol(name="half_open", host=host, port=port, half_open=True), count
+    )
+    server.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -0,0 +1,100 @@
+"""
+探测工作进程：大量 HTTP 服务探测时机器人进程事件循环的响应延迟
+
+在不同工作进程数下完整探测 --services 个服务 --rounds 轮，同时以 10ms 间隔测量事件循环的调度延迟，
+延迟越低，机器人处理消息越不受探测影响。替身服务器运行在独立的子进程中
+
+python benchmark/bench_workers.py [--services 2000] [--workers 0,2,4] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from utils import init_nonebot
+
+init_nonebot()
+
+import nonebot
+from nonebot.log import logger
+
+nonebot.load_plugin("nonebot_plugin_servicestate")
+
+from nonebot_plugin_servicestate.executor import probe_executor
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.worker import worker_pool
+from servers import HTTPStandInServer
+
+
+def run_server(conn) -> None:
+    async def serve() -> None:
+        server = HTTPStandInServer(latency=0.005)
+        await server.start()
+        conn.send(server.url)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def measure_lag(stop: asyncio.Event, lag: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lag.append((time.perf_counter() - start - 0.01) * 1000)
+
+
+async def measure(workers: int, url: str, args: argparse.Namespace) -> None:
+    worker_pool.configure(workers)
+    await worker_pool.start()
+    # 预热：工作进程启动并导入 httpx
+    await manager.get_detect_result(force=True)
+    lag: list = []
+    stop = asyncio.Event()
+    lag_task = asyncio.ensure_future(measure_lag(stop, lag))
+    cost = []
+    failed = 0
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        results = await manager.get_detect_result(force=True)
+        cost.append((time.perf_counter() - start) * 1000)
+        failed += sum(1 for i in results.values() if not i)
+    stop.set()
+    await lag_task
+    await worker_pool.stop()
+    lag.sort()
+    print(
+        f"workers {workers:<2} | round {statistics.mean(cost):8.1f} ms | "
+        f"loop lag p50 {lag[len(lag) // 2]:6.1f} ms p99 {lag[int(len(lag) * 0.99)]:6.1f} ms max {lag[-1]:6.1f} ms | "
+        f"failed {failed}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    logger.remove()
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=run_server, args=(child_conn,), daemon=True)
+    server.start()
+    url = parent_conn.recv()
+    probe_executor.configure(max_concurrency=args.max_concurrency, max_per_host=0, result_ttl=0)
+    manager.load_dict(
+        {
+            "service": {"HTTP": [{"name": f"http-{i}", "host": f"{url}{i}"} for i in range(args.services)]},
+            "service_group": {},
+        }
+    )
+    try:
+        for workers in args.workers:
+            await measure(workers, url, args)
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", type=int, default=2000, help="服务数量")
+    parser.add_argument("--workers", type=lambda i: [int(j) for j in i.split(",")], default=[0, 2, 4])
+    parser.add_argument("--rounds", type=int, default=3, help="探测轮数")
+    parser.add_argument("--max-concurrency", type=int, default=256, help="同时进行的探测数量上限")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,259 @@
+"""
+基准测试用的本地替身服务器
+"""
+
+import asyncio
+import os
+import random
+import socket
+import ssl
+import subprocess
+import tempfile
+from typing import List, Optional, Sequence, Set, Tuple
+
+
+def self_signed_context(alpn: Sequence[str]) -> ssl.SSLContext:
+    """
+    使用 openssl 生成临时自签名证书，返回协商 alpn 协议的服务端 SSLContext
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        cert = os.path.join(directory, "cert.pem")
+        key = os.path.join(directory, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1"]
+            + ["-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+            check=True,
+            capture_output=True,
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(list(alpn))
+    return context
+
+
+class HTTPStandInServer:
+    """
+    支持 keep-alive 的最小 HTTP/1.1 服务器
+
+    请求路径以 /fail 开头时返回 500，以 /hole 开头时读取请求后不再响应，其余路径在 latency 秒后返回 200
+    failure_rate 与 blackhole_rate 为其余路径随机返回 500 或不响应的比例
+    200 响应体长度为 body_size 字节，以 OK 开头，支持 HEAD 与 Range: bytes=0-N 请求
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        blackhole_rate: float = 0.0,
+        body_size: int = 2,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.blackhole_rate = blackhole_rate
+        self.body = (b"OK" + b"." * body_size)[: max(body_size, 2)]
+        self.ssl_context = ssl_context
+        self.connection_count = 0
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"{'http' if self.ssl_context is None else 'https'}://{self.host}:{self.port}/"
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connection_count += 1
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n\r\n")
+                if not header:
+                    break
+                self.request_count += 1
+                method, path, _ = header.split(b" ", 2)
+                roll = random.random()
+                if path.startswith(b"/hole") or roll < self.blackhole_rate:
+                    # 黑洞：保持连接但不再响应
+                    await asyncio.Event().wait()
+                if self.latency > 0:
+                    await asyncio.sleep(self.latency)
+                if path.startswith(b"/fail") or roll < self.blackhole_rate + self.failure_rate:
+                    response = b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 4\r\nConnection: keep-alive\r\n\r\nFAIL"
+                else:
+                    response = self.__ok_response(method, header)
+                self.bytes_sent += len(response)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def __ok_response(self, method: bytes, header: bytes) -> bytes:
+        body = self.body
+        status = b"200 OK"
+        for line in header.split(b"\r\n"):
+            if line.lower().startswith(b"range: bytes=0-"):
+                body = body[: int(line[15:]) + 1]
+                status = b"206 Partial Content"
+        head = b"HTTP/1.1 %s\r\nContent-Length: %d\r\nConnection: keep-alive\r\n\r\n" % (status, len(body))
+        return head if method == b"HEAD" else head + body
+
+    async def start(self) -> Tuple[str, int]:
+        self.__server = await asyncio.start_server(
+            self.__handle, self.host, self.port, backlog=4096, ssl=self.ssl_context
+        )
+        self.port = self.__server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+
+
+class HTTP2StandInServer:
+    """
+    仅支持 HTTP/2（ALPN h2）的 TLS 服务器，所有请求在 latency 秒后返回 200
+
+    max_streams 为记录到的单个连接上同时处理的最大请求数，需要安装 h2
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connection_count = 0
+        self.request_count = 0
+        self.max_streams = 0
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"https://{self.host}:{self.port}/"
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import ConnectionTerminated, RequestReceived
+        from h2.exceptions import ProtocolError
+
+        self.connection_count += 1
+        connection = H2Connection(H2Configuration(client_side=False))
+        connection.initiate_connection()
+        writer.write(connection.data_to_send())
+        streams: Set[int] = set()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                for event in connection.receive_data(data):
+                    if isinstance(event, RequestReceived):
+                        streams.add(event.stream_id)
+                        self.max_streams = max(self.max_streams, len(streams))
+                        asyncio.ensure_future(self.__respond(connection, writer, streams, event.stream_id))
+                    elif isinstance(event, ConnectionTerminated):
+                        return
+                writer.write(connection.data_to_send())
+        except (ConnectionError, ProtocolError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def __respond(self, connection, writer: asyncio.StreamWriter, streams: Set[int], stream_id: int) -> None:
+        self.request_count += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        streams.discard(stream_id)
+        connection.send_headers(stream_id, [(":status", "200"), ("content-length", "2")])
+        connection.send_data(stream_id, b"OK", end_stream=True)
+        writer.write(connection.data_to_send())
+
+    async def start(self) -> Tuple[str, int]:
+        context = self_signed_context(["h2"])
+        self.__server = await asyncio.start_server(self.__handle, self.host, self.port, backlog=4096, ssl=context)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+
+
+class TCPStandInServer:
+    """
+    只接受连接的 TCP 服务器，连接保持到对端关闭
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.connection_count = 0
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connection_count += 1
+        try:
+            await reader.read(1)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> Tuple[str, int]:
+        self.__server = await asyncio.start_server(self.__handle, self.host, self.port, backlog=4096)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        return self.host, self.port
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+
+
+class BlackHoleTCPServer:
+    """
+    TCP 黑洞：监听队列已满且从不 accept，新的连接请求会被内核丢弃直至超时
+    """
+
+    def __init__(self, host: str = "127.0.0.1") -> None:
+        self.host = host
+        self.port = 0
+        self.__listener: Optional[socket.socket] = None
+        self.__fillers: List[socket.socket] = []
+
+    def start(self) -> Tuple[str, int]:
+        self.__listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__listener.bind((self.host, 0))
+        self.__listener.listen(0)
+        self.port = self.__listener.getsockname()[1]
+        # 填满监听队列
+        for _ in range(4):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex((self.host, self.port))
+            self.__fillers.append(filler)
+        return self.host, self.port
+
+    def stop(self) -> None:
+        for i in self.__fillers:
+            i.close()
+        self.__fillers.clear()
+        if self.__listener is not None:
+            self.__listener.close()
+            self.__listener = None
+
+
+def closed_port(host: str = "127.0.0.1") -> int:
+    """
+    获取一个当前未被监听的端口，连接时会被直接拒绝
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
@@ -0,0 +1,71 @@
+"""
+并发探测与修改命令的压力测试
+
+在探测进行期间反复添加、删除、群组及解散服务，检查遍历是否互相干扰
+
+python benchmark/stress_iteration.py [轮数]
+"""
+
+import asyncio
+import random
+import sys
+
+from utils import init_nonebot
+
+init_nonebot()
+
+from nonebot_plugin_servicestate.manager import manager
+from nonebot_plugin_servicestate.protocol import BaseProtocol
+from nonebot_plugin_servicestate.exception import NameConflictError, NameNotFoundError
+
+
+class SleepProtocol(BaseProtocol):
+    _PROTOCOL_NAME = "StressSleep"
+
+    async def detect(self) -> bool:
+        await asyncio.sleep(random.random() / 100)
+        return True
+
+
+async def probe_loop(rounds: int) -> int:
+    checked = 0
+    for _ in range(rounds):
+        result = await manager.get_detect_result(force=True)
+        for name, probe_result in result.items():
+            assert probe_result, f"{name} -> {probe_result}"
+        checked += len(result)
+    return checked
+
+
+async def mutate_loop(rounds: int) -> None:
+    for i in range(rounds):
+        names = [f"s{i}-{j}" for j in range(4)]
+        for name in names:
+            manager.bind_new_service("StressSleep", name, "127.0.0.1")
+        await asyncio.sleep(0)
+        manager.bind_group_by_name(names[:2], f"g{i}")
+        await asyncio.sleep(0)
+        for _ in manager.iter_services():
+            # 嵌套遍历与修改交错
+            for _ in manager.iter_services():
+                pass
+            manager.unbind_service_by_name(names[3])
+            break
+        try:
+            manager.unbind_group_by_name(f"g{i}")
+        except (NameConflictError, NameNotFoundError):
+            pass
+        await asyncio.sleep(0)
+        if i >= 2:
+            for name in [f"s{i - 2}-{j}" for j in range(3)]:
+                manager.unbind_service_by_name(name)
+
+
+async def main(rounds: int) -> None:
+    checked, _ = await asyncio.gather(probe_loop(rounds), mutate_loop(rounds))
+    single, group, group_service = manager.get_service_count()
+    print(f"rounds {rounds} | checked {checked} results | remaining {single} single, {group} group ({group_service})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
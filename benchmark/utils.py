@@ -0,0 +1,23 @@
+"""
+基准测试公用工具
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+
+def init_nonebot() -> Path:
+    """
+    初始化 NoneBot，并将插件数据目录指向临时目录，避免读写真实配置
+    """
+    data_dir = Path(tempfile.mkdtemp(prefix="servicestate-bench-"))
+    os.environ["XDG_DATA_HOME"] = str(data_dir)
+    os.environ["LOCALSTORE_DATA_DIR"] = str(data_dir)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    import nonebot
+
+    nonebot.init()
+    return data_dir
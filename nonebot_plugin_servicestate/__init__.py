@@ -1,64 +1,384 @@
-from typing import List, Tuple
+from typing import Dict, List, Tuple, Type
+from pathlib import Path
+import asyncio
+import sys
 from pydantic import ValidationError
 
+from nonebot import get_app, get_driver
 from nonebot.plugin.on import on_command
 from nonebot.params import CommandArg, Depends
-from nonebot.adapters.onebot.v11 import Message
+from nonebot.adapters.onebot.v11 import Bot, Message, MessageEvent
 from nonebot.permission import SUPERUSER
 from nonebot.plugin import PluginMetadata
 
 from nonebot.log import logger
 
-from .service import SupportProtocol
+from .service import BaseProtocol, SupportProtocol, ProbeResult
 from .exception import (
     ProtocolUnsopportError,
     NameConflictError,
     ParamCountInvalidError,
     NameEscapeCharacterCountError,
     NameNotFoundError,
+    ImportFormatError,
+    ImportInvalidError,
 )
-from .manager import manager
+from .manager import (
+    manager,
+    history_store,
+    config_store,
+    chat_settings,
+    BULK_FILE_DIR_PATH,
+)
+from .bulk import parse_entries, dump_entries
+from .persistence import atomic_write
+from .chat import get_chat_key
 from .utils import Escharacter
+from .config import Config, plugin_config
+from .protocol.dns import dns_cache
+from .scheduler import ProbeScheduler
+from .executor import probe_executor
+from .worker import worker_pool
+from .breaker import adaptive_timeout, circuit_breaker
+from .events import event_bus, transition_detector
+from .alert import SUBSCRIBE_SETTING_KEY, AlertNotifier
+from .render import format_result_line, format_summary, status_renderer
+from .metrics import metrics, handler_duration, timed
 
 __plugin_meta__ = PluginMetadata(
     name="服务状态查询",
     description="API服务状态监测",
     usage="""\
-服务状态：查询API可用状态
+服务状态 [刷新] [延迟] [概要] [页码]：查询API可用状态，“刷新”忽略缓存重新探测，“延迟”显示探测耗时，“概要”只显示故障服务
+服务统计 [名称]：查询服务近 1 小时、24 小时、7 天的可用率及耗时
 
 以下为管理员权限命令：
+服务状态模式 [流式|完整]：设置当前会话的服务状态回复方式
+订阅服务状态 / 取消订阅服务状态：在当前会话中推送服务故障与恢复
 添加服务 <协议> <名称> <地址>
 修改服务 <名称> <参数名> <参数内容>
 群组服务 <名称1> <名称2> <群组名称>
 解散群组 <群组名称>
 删除服务 <名称>
+导入服务 <JSON 或 CSV 内容|数据目录 exports 文件夹中的文件名>：批量添加服务
+导出服务 [json|csv] [文件名]：导出所有服务，指定文件名时保存到数据目录的 exports 文件夹
+探测统计：查看探测排队与耗时统计
+服务指标 [关键字] [页码]：查看 Prometheus 格式的指标，不带关键字时只列出指标名称
 """,
     type="application",
     homepage="https://github.com/OREOCODEDEV/nonebot-plugin-servicestate",
+    config=Config,
+)
+
+driver = get_driver()
+
+
+def configure_http_protocol(protocol: Type[BaseProtocol]) -> None:
+    # HTTP 协议在配置中出现时才导入 httpx
+    from .protocol.http import client_pool
+
+    client_pool.configure(
+        max_connections=plugin_config.servicestate_http_max_connections,
+        max_keepalive_connections=plugin_config.servicestate_http_max_keepalive_connections,
+        keepalive_expiry=plugin_config.servicestate_http_keepalive_expiry,
+        http2_max_streams=plugin_config.servicestate_http2_max_streams,
+    )
+
+
+SupportProtocol.on_import("HTTP", configure_http_protocol)
+
+dns_cache.configure(
+    ttl=plugin_config.servicestate_dns_cache_ttl,
+    negative_ttl=plugin_config.servicestate_dns_negative_ttl,
+    max_size=plugin_config.servicestate_dns_cache_size,
+)
+
+probe_executor.configure(
+    max_concurrency=plugin_config.servicestate_max_concurrency,
+    max_per_host=plugin_config.servicestate_max_per_host,
+    result_ttl=plugin_config.servicestate_probe_result_ttl,
+)
+
+worker_pool.configure(
+    workers=plugin_config.servicestate_probe_workers,
+    settings={
+        "http": {
+            "max_connections": plugin_config.servicestate_http_max_connections,
+            "max_keepalive_connections": plugin_config.servicestate_http_max_keepalive_connections,
+            "keepalive_expiry": plugin_config.servicestate_http_keepalive_expiry,
+            "http2_max_streams": plugin_config.servicestate_http2_max_streams,
+        },
+        "dns": {
+            "ttl": plugin_config.servicestate_dns_cache_ttl,
+            "negative_ttl": plugin_config.servicestate_dns_negative_ttl,
+            "max_size": plugin_config.servicestate_dns_cache_size,
+        },
+    },
 )
 
+circuit_breaker.configure(
+    threshold=plugin_config.servicestate_breaker_threshold,
+    backoff=plugin_config.servicestate_breaker_backoff,
+    max_backoff=plugin_config.servicestate_breaker_max_backoff,
+)
+
+adaptive_timeout.configure(
+    enabled=plugin_config.servicestate_adaptive_timeout,
+    factor=plugin_config.servicestate_adaptive_timeout_factor,
+    minimum=plugin_config.servicestate_adaptive_timeout_min,
+)
+
+transition_detector.configure(
+    down_threshold=plugin_config.servicestate_alert_down_threshold,
+    up_threshold=plugin_config.servicestate_alert_up_threshold,
+    flap_window=plugin_config.servicestate_alert_flap_window,
+    flap_threshold=plugin_config.servicestate_alert_flap_threshold,
+)
+
+alert_notifier = AlertNotifier(chat_settings, batch_window=plugin_config.servicestate_alert_batch_window)
+event_bus.subscribe(alert_notifier)
+
+config_store.configure(
+    debounce=plugin_config.servicestate_config_save_debounce,
+    journal=plugin_config.servicestate_config_journal,
+    journal_max_records=plugin_config.servicestate_config_journal_max_records,
+)
+
+status_renderer.configure(page_size=plugin_config.servicestate_status_page_size)
+
+history_store.configure(
+    capacity=plugin_config.servicestate_history_capacity,
+    max_log_size=plugin_config.servicestate_history_max_log_size,
+)
+
+scheduler = ProbeScheduler(
+    manager,
+    tick=plugin_config.servicestate_scheduler_tick,
+    jitter=plugin_config.servicestate_scheduler_jitter,
+)
+
+
+def mount_metrics_endpoint(path: str) -> None:
+    try:
+        app = get_app()
+        from starlette.requests import Request
+        from starlette.responses import Response
+    except (AssertionError, ValueError, ImportError):
+        logger.warning("Metrics endpoint requires a starlette based reverse driver, skipped")
+        return
+
+    async def metrics_endpoint(request: Request) -> Response:
+        manager.prune_metrics()
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    app.add_route(path, metrics_endpoint, methods=["GET"])
+    logger.debug(f"Metrics endpoint mounted at {path}")
+
+
+if plugin_config.servicestate_metrics_path:
+    mount_metrics_endpoint(plugin_config.servicestate_metrics_path)
+
+
+@driver.on_startup
+async def _():
+    await manager.load_async()
+    await asyncio.get_event_loop().run_in_executor(None, history_store.load)
+    history_store.start(
+        plugin_config.servicestate_history_flush_interval,
+        lambda: {key for key, _ in manager.iter_services()},
+    )
+    await worker_pool.start()
+    if plugin_config.servicestate_scheduler_enabled:
+        scheduler.start()
+
+
+@driver.on_shutdown
+async def _():
+    await scheduler.stop()
+    await worker_pool.stop()
+    await alert_notifier.stop()
+    await config_store.flush()
+    await history_store.stop()
+    http_module = sys.modules.get(f"{__name__}.protocol.http")
+    if http_module is not None:
+        await http_module.client_pool.aclose()
+
+
 service_status_matcher = on_command("服务状态")
 
 
+def format_result_age(force: bool) -> str:
+    result_age = manager.get_oldest_result_age()
+    if not force and result_age is not None and result_age >= 1:
+        return f"\n（结果更新于 {int(result_age)} 秒前）"
+    return ""
+
+
+async def send_streaming_status(force: bool, show_latency: bool) -> None:
+    """
+    首次等待窗口内完成的结果立即回复，尚未完成的服务显示为检测中，全部完成后再补充发送
+    服务数量超过一页时两次回复都只显示正常与故障数量及故障服务
+    """
+    names = manager.get_result_names()
+    brief = 0 < status_renderer.page_size < len(names)
+    results: Dict[str, ProbeResult] = {}
+
+    async def collect() -> None:
+        async for name, result in manager.iter_detect_result(force=force):
+            results[name] = result
+
+    collector = asyncio.ensure_future(collect())
+    try:
+        await asyncio.wait({collector}, timeout=plugin_config.servicestate_stream_first_wait)
+        if collector.done():
+            collector.result()
+            if brief:
+                text = format_summary({i: results[i] for i in names}, show_latency)
+            else:
+                text = "\n".join(format_result_line(i, results[i], show_latency) for i in names)
+            await service_status_matcher.finish(text + format_result_age(force))
+        pending = [i for i in names if i not in results]
+        if brief:
+            text = format_summary({i: results[i] for i in names if i in results}, show_latency)
+            text += f"\n其余 {len(pending)} 个服务检测中"
+        else:
+            text = "\n".join(
+                format_result_line(i, results[i], show_latency) if i in results else f"- 检测中 | {i}" for i in names
+            )
+        await service_status_matcher.send(text)
+        await collector
+    finally:
+        collector.cancel()
+    if brief:
+        text = format_summary({i: results[i] for i in names}, show_latency)
+    else:
+        text = "\n".join(format_result_line(i, results[i], show_latency) for i in pending)
+    await service_status_matcher.finish("检测完成：\n" + text)
+
+
 @service_status_matcher.handle()
-async def _():
-    result_dict = await manager.get_detect_result()
+@timed(handler_duration, ("服务状态",))
+async def _(event: MessageEvent, command_arg: Message = CommandArg()):
+    args = command_arg.extract_plain_text().split()
+    force = "刷新" in args or "强制刷新" in args
+    show_latency = plugin_config.servicestate_show_latency or "延迟" in args
+    summary = "概要" in args
+    page = next((int(i) for i in args if i.isdecimal()), None)
+    if (
+        page is None
+        and not summary
+        and chat_settings.get(get_chat_key(event), "stream", plugin_config.servicestate_stream_default)
+    ):
+        if not manager.get_result_names():
+            await service_status_matcher.finish("您未绑定任何服务！")
+        await send_streaming_status(force, show_latency)
+    # 先取版本再取结果，期间完成的探测只会使缓存提前失效
+    version = manager.latency_version if show_latency else manager.result_version
+    result_dict = await manager.get_detect_result(force=force)
     if result_dict == {}:
         await service_status_matcher.finish("您未绑定任何服务！")
-    pretty_text = ""
-    for name, result in result_dict.items():
-        if result:
-            pretty_text += f"O 正常 | {name}\n"
-        else:
-            pretty_text += f"X 故障 | {name}\n"
-    pretty_text = pretty_text[:-1]
-    await service_status_matcher.finish(pretty_text)
+    if summary:
+        await service_status_matcher.finish(
+            status_renderer.summary(version, result_dict, show_latency) + format_result_age(force)
+        )
+    pages = status_renderer.pages(version, result_dict, show_latency)
+    page = page or 1
+    if page > len(pages):
+        await service_status_matcher.finish(f"页码超出范围，共 {len(pages)} 页")
+    text = pages[page - 1] + format_result_age(force)
+    if len(pages) > 1:
+        text += f"\n第 {page}/{len(pages)} 页"
+        if page < len(pages):
+            text += f"，发送 服务状态 {page + 1} 查看下一页"
+    await service_status_matcher.finish(text)
+
+
+service_status_mode_matcher = on_command("服务状态模式", permission=SUPERUSER)
+
+
+@service_status_mode_matcher.handle()
+@timed(handler_duration, ("服务状态模式",))
+async def _(event: MessageEvent, command_arg: Message = CommandArg()):
+    chat_key = get_chat_key(event)
+    mode = command_arg.extract_plain_text().strip()
+    if mode == "流式":
+        chat_settings.set(chat_key, "stream", True)
+    elif mode == "完整":
+        chat_settings.set(chat_key, "stream", False)
+    elif mode:
+        await service_status_mode_matcher.finish("参数错误\n服务状态模式 [流式|完整]")
+    stream = chat_settings.get(chat_key, "stream", plugin_config.servicestate_stream_default)
+    await service_status_mode_matcher.finish(f"当前会话的服务状态模式：{'流式' if stream else '完整'}")
+
+
+subscribe_matcher = on_command("订阅服务状态", aliases={"服务状态订阅"}, permission=SUPERUSER)
+
+
+@subscribe_matcher.handle()
+@timed(handler_duration, ("订阅服务状态",))
+async def _(bot: Bot, event: MessageEvent):
+    chat_settings.set(get_chat_key(event), SUBSCRIBE_SETTING_KEY, bot.self_id)
+    await subscribe_matcher.finish("已订阅，服务故障或恢复时将在当前会话推送")
+
+
+unsubscribe_matcher = on_command("取消订阅服务状态", aliases={"服务状态取消订阅"}, permission=SUPERUSER)
+
+
+@unsubscribe_matcher.handle()
+@timed(handler_duration, ("取消订阅服务状态",))
+async def _(event: MessageEvent):
+    chat_key = get_chat_key(event)
+    if chat_settings.get(chat_key, SUBSCRIBE_SETTING_KEY) is None:
+        await unsubscribe_matcher.finish("当前会话未订阅服务状态")
+    chat_settings.set(chat_key, SUBSCRIBE_SETTING_KEY, None)
+    await unsubscribe_matcher.finish("已取消订阅")
 
 
 def extract_str_list(command_arg: Message = CommandArg()):
     return command_arg.extract_plain_text().split()
 
 
+HISTORY_WINDOWS = (("1h", 3600), ("24h", 86400), ("7d", 604800))
+# 不指定名称时最多统计的服务数量
+HISTORY_DISPLAY_LIMIT = 10
+
+service_history_matcher = on_command("服务统计", aliases={"统计服务"})
+
+
+@service_history_matcher.handle()
+@timed(handler_duration, ("服务统计",))
+async def _(command_arg_list: List[str] = Depends(extract_str_list)):
+    service_keys = [key for key, _ in manager.iter_services()]
+    if command_arg_list:
+        try:
+            name = Escharacter(command_arg_list[0])
+        except NameEscapeCharacterCountError:
+            await service_history_matcher.finish("操作失败：@ 转义符解析错误\n服务统计 <群组名>@<服务名>")
+        if name.is_group:
+            service_keys = [key for key in service_keys if key == tuple(name.group_name)]
+        else:
+            service_keys = [key for key in service_keys if key == (None, name.name) or key[0] == name.name]
+        if not service_keys:
+            await service_history_matcher.finish("操作失败：未找到该服务名称！")
+    if not service_keys:
+        await service_history_matcher.finish("您未绑定任何服务！")
+    lines: List[str] = []
+    for key in service_keys[:HISTORY_DISPLAY_LIMIT]:
+        lines.append(key[1] if key[0] is None else f"{key[0]}@{key[1]}")
+        for window_name, window in HISTORY_WINDOWS:
+            stats = history_store.stats(key, window)
+            if stats.uptime is None:
+                lines.append(f"{window_name}：暂无数据")
+                continue
+            line = f"{window_name}：可用率 {stats.uptime * 100:.1f}%"
+            if stats.p50 is not None:
+                line += f" | p50 {stats.p50 * 1000:.0f}ms | p95 {stats.p95 * 1000:.0f}ms"
+            lines.append(line)
+    if len(service_keys) > HISTORY_DISPLAY_LIMIT:
+        lines.append(f"……共 {len(service_keys)} 个服务，发送 服务统计 <名称> 查看其他服务")
+    await service_history_matcher.finish("\n".join(lines))
+
+
 service_add_matcher = on_command(
     "添加服务",
     aliases={"服务添加", "服务增加", "服务新增", "增加服务", "新增服务"},
@@ -67,6 +387,7 @@ service_add_matcher = on_command(
 
 
 @service_add_matcher.handle()
+@timed(handler_duration, ("添加服务",))
 async def _(command_arg_list: List[str] = Depends(extract_str_list)):
     if len(command_arg_list) < 3:
         await service_add_matcher.finish(f"参数不足\n添加服务 <协议> <名称> <地址>")
@@ -91,6 +412,7 @@ service_del_matcher = on_command("服务删除", aliases={"删除服务"}, permi
 
 
 @service_del_matcher.handle()
+@timed(handler_duration, ("删除服务",))
 async def _(command_arg: Message = CommandArg()):
     try:
         manager.unbind_service_by_name(command_arg.extract_plain_text())
@@ -100,10 +422,92 @@ async def _(command_arg: Message = CommandArg()):
     await service_del_matcher.finish("已删除服务：" + command_arg)
 
 
+IMPORT_ERROR_DISPLAY_LIMIT = 20
+
+
+def get_data_file_path(file_name: str) -> Path:
+    """
+    批量导入导出的文件只能直接位于插件数据目录的 exports 文件夹中，无法读写插件自身的配置、日志及历史文件
+    """
+    if file_name in ("", ".", "..") or Path(file_name).name != file_name:
+        raise ValueError(f"Invalid data file name {file_name}")
+    return BULK_FILE_DIR_PATH / file_name
+
+
+def write_data_file(file_name: str, text: str) -> Path:
+    path = get_data_file_path(file_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, text)
+    return path
+
+
+def read_data_file(file_name: str) -> str:
+    with open(get_data_file_path(file_name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+service_import_matcher = on_command("导入服务", aliases={"服务导入", "批量添加服务"}, permission=SUPERUSER)
+
+
+@service_import_matcher.handle()
+@timed(handler_duration, ("导入服务",))
+async def _(command_arg: Message = CommandArg()):
+    text = command_arg.extract_plain_text().strip()
+    if not text:
+        await service_import_matcher.finish("参数不足\n导入服务 <JSON 或 CSV 内容>\n导入服务 <数据目录 exports 文件夹中的文件名>")
+    # 单行且不是 JSON 时视为 exports 文件夹中的文件名，CSV 内容至少包含表头与一行服务
+    if "\n" not in text and text[0] not in "[{":
+        try:
+            text = await asyncio.get_event_loop().run_in_executor(None, read_data_file, text)
+        except (OSError, ValueError):
+            await service_import_matcher.finish(f"操作失败：无法读取 exports 文件夹中的文件 {text}")
+    try:
+        count = manager.import_services(parse_entries(text))
+    except ImportFormatError as e:
+        await service_import_matcher.finish(f"操作失败：{e}")
+    except ImportInvalidError as e:
+        errors = list(e.args)
+        text = "\n".join(errors[:IMPORT_ERROR_DISPLAY_LIMIT])
+        if len(errors) > IMPORT_ERROR_DISPLAY_LIMIT:
+            text += f"\n……共 {len(errors)} 项错误"
+        await service_import_matcher.finish("操作失败，未导入任何服务：\n" + text)
+    manager.save()
+    await service_import_matcher.finish(f"已导入 {count} 个服务")
+
+
+service_export_matcher = on_command("导出服务", aliases={"服务导出"}, permission=SUPERUSER)
+
+
+@service_export_matcher.handle()
+@timed(handler_duration, ("导出服务",))
+async def _(command_arg_list: List[str] = Depends(extract_str_list)):
+    fmt = None
+    file_name = None
+    for arg in command_arg_list:
+        if arg.lower() in ("json", "csv"):
+            fmt = arg.lower()
+        else:
+            file_name = arg
+    if fmt is None:
+        fmt = "csv" if file_name is not None and file_name.lower().endswith(".csv") else "json"
+    entries = manager.export_entries()
+    if not entries:
+        await service_export_matcher.finish("您未绑定任何服务！")
+    text = dump_entries(entries, fmt)
+    if file_name is None:
+        await service_export_matcher.finish(text.rstrip("\n"))
+    try:
+        path = await asyncio.get_event_loop().run_in_executor(None, write_data_file, file_name, text)
+    except (OSError, ValueError):
+        await service_export_matcher.finish(f"操作失败：无法写入 exports 文件夹中的文件 {file_name}")
+    await service_export_matcher.finish(f"已导出 {len(entries)} 个服务到 {path}")
+
+
 service_group_matcher = on_command("服务合并", aliases={"合并服务", "群组服务", "服务群组"}, permission=SUPERUSER)
 
 
 @service_group_matcher.handle()
+@timed(handler_duration, ("合并服务",))
 async def _(command_arg_list: List[str] = Depends(extract_str_list)):
     if len(command_arg_list) < 3:
         await service_group_matcher.finish(f"参数不足\n合并服务 <名称1> <名称2> <群组名称>")
@@ -113,6 +517,8 @@ async def _(command_arg_list: List[str] = Depends(extract_str_list)):
         manager.bind_group_by_name(bind_service_name_list, name)
     except NameNotFoundError:
         await service_group_matcher.finish("操作失败：合并的服务名称中有一个或多个无法找到！")
+    except NameConflictError:
+        await service_group_matcher.finish("操作失败：群组名称与现有名称重复")
     manager.save()
     await service_group_matcher.finish(f"已成功合并 {len(bind_service_name_list)} 个服务")
 
@@ -121,6 +527,7 @@ service_ungroup_matcher = on_command("服务解散", aliases={"解散服务", "
 
 
 @service_ungroup_matcher.handle()
+@timed(handler_duration, ("解散群组",))
 async def _(name_msg: Message = CommandArg()):
     name = name_msg.extract_plain_text()
     try:
@@ -139,6 +546,7 @@ service_set_matcher = on_command("服务修改", aliases={"修改服务"}, permi
 
 
 @service_set_matcher.handle()
+@timed(handler_duration, ("修改服务",))
 async def _(command_arg_list: List[str] = Depends(extract_str_list)):
     if len(command_arg_list) < 3:
         await service_group_matcher.finish(f"参数不足\n修改服务 <名称> <参数> <值>")
@@ -154,10 +562,14 @@ async def _(command_arg_list: List[str] = Depends(extract_str_list)):
         settings_list.append((command_arg_list[i], command_arg_list[i + 1]))
     logger.debug(f"Modifying settings: {name} @ {settings_list}")
     try:
-        for key, value in settings_list:
-            manager.modify_service_param(name.auto_name, key, value)
+        # 同一命令中的多项修改作为一个事务提交，任一项失败时全部撤销
+        with manager.transaction():
+            for key, value in settings_list:
+                manager.modify_service_param(name.auto_name, key, value)
     except NameNotFoundError:
         await service_set_matcher.finish("操作失败：修改的服务名或参数名未找到")
+    except NameConflictError:
+        await service_set_matcher.finish("操作失败：修改后的服务名称与现有名称重复")
     except ValidationError:
         await service_set_matcher.finish("操作失败：参数格式或类型不正确")
     except:
@@ -170,6 +582,51 @@ reload_config_matcher = on_command("服务重载", permission=SUPERUSER)
 
 
 @reload_config_matcher.handle()
+@timed(handler_duration, ("服务重载",))
 async def _():
-    manager.load()
+    await manager.load_async()
     await reload_config_matcher.finish("已重新载入服务状态配置")
+
+
+probe_stats_matcher = on_command("探测统计", permission=SUPERUSER)
+
+
+@probe_stats_matcher.handle()
+@timed(handler_duration, ("探测统计",))
+async def _():
+    stats = probe_executor.stats
+    await probe_stats_matcher.finish(
+        f"累计探测：{stats.count} 次 | 合并 {stats.coalesced} 次\n"
+        f"排队等待：平均 {stats.queue_wait_avg * 1000:.1f}ms | 最大 {stats.queue_wait_max * 1000:.1f}ms\n"
+        f"探测耗时：平均 {stats.probe_time_avg * 1000:.1f}ms | 最大 {stats.probe_time_max * 1000:.1f}ms\n"
+        f"熔断中：{circuit_breaker.open_count()} 个服务"
+        + (f"\n探测进程：{len(worker_pool)} 个" if worker_pool.is_running else "")
+    )
+
+
+metrics_matcher = on_command("服务指标", permission=SUPERUSER)
+
+
+@metrics_matcher.handle()
+@timed(handler_duration, ("服务指标",))
+async def _(command_arg: Message = CommandArg()):
+    args = command_arg.extract_plain_text().split()
+    manager.prune_metrics()
+    if not args:
+        await metrics_matcher.finish(f"{metrics.summary()}\n发送 服务指标 <关键字> [页码] 查看包含关键字的样本")
+    page = int(args.pop()) if len(args) > 1 and args[-1].isdecimal() else 1
+    keyword = " ".join(args)
+    lines = metrics.render(keyword).splitlines()
+    if not lines:
+        await metrics_matcher.finish("暂无匹配的指标")
+    size = plugin_config.servicestate_status_page_size
+    size = size if size > 0 else len(lines)
+    pages = (len(lines) + size - 1) // size
+    if page < 1 or page > pages:
+        await metrics_matcher.finish(f"页码超出范围，共 {pages} 页")
+    text = "\n".join(lines[(page - 1) * size : page * size])
+    if pages > 1:
+        text += f"\n第 {page}/{pages} 页"
+        if page < pages:
+            text += f"，发送 服务指标 {keyword} {page + 1} 查看下一页"
+    await metrics_matcher.finish(text)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import List, Optional
+import asyncio
+
+from nonebot import get_bots
+from nonebot.log import logger
+
+from .chat import ChatSettings, parse_chat_key
+from .events import EVENT_DOWN, EVENT_UP, TransitionEvent
+
+# 订阅状态推送的会话在会话设置中的键，值为订阅时的机器人 self_id
+SUBSCRIBE_SETTING_KEY = "subscribe"
+
+
+def format_event(event: TransitionEvent) -> str:
+    if event.kind == EVENT_DOWN:
+        line = f"X 故障 | {event.display_name}"
+        if event.result.error:
+            line += f" | {event.result.error}"
+        return line
+    if event.kind == EVENT_UP:
+        return f"O 恢复 | {event.display_name}"
+    return f"~ 抖动 | {event.display_name} | 近期状态变化 {event.changes} 次，恢复稳定前不再逐次通知"
+
+
+class AlertNotifier:
+    """
+    将状态变化事件推送到订阅的会话
+
+    batch_window 秒内的事件合并为一条消息，每次推送的耗时只与事件数量及订阅会话数量相关
+    """
+
+    def __init__(self, chat_settings: ChatSettings, batch_window: float = 1.0) -> None:
+        self.__chat_settings = chat_settings
+        self.__batch_window = batch_window
+        self.__pending: List[TransitionEvent] = []
+        self.__timer: Optional[asyncio.TimerHandle] = None
+        self.__send_task: Optional[asyncio.Task] = None
+
+    def configure(self, batch_window: float = 1.0) -> None:
+        self.__batch_window = batch_window
+
+    async def __call__(self, event: TransitionEvent) -> None:
+        self.__pending.append(event)
+        if self.__timer is None:
+            self.__timer = asyncio.get_event_loop().call_later(self.__batch_window, self.__on_timer)
+
+    def __on_timer(self) -> None:
+        self.__timer = None
+        self.__send_task = asyncio.get_event_loop().create_task(self.flush())
+
+    async def flush(self) -> None:
+        """
+        立即推送尚未发送的事件
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        events, self.__pending = self.__pending, []
+        if not events:
+            return
+        subscribers = self.__chat_settings.find(SUBSCRIBE_SETTING_KEY)
+        if not subscribers:
+            return
+        message = "服务状态变化：\n" + "\n".join(format_event(i) for i in events)
+        bots = get_bots()
+        for chat_key, self_id in subscribers.items():
+            bot = bots.get(self_id) or next(iter(bots.values()), None)
+            if bot is None:
+                logger.warning("No bot connected, state transitions not pushed")
+                return
+            chat_type, chat_id = parse_chat_key(chat_key)
+            try:
+                if chat_type == "group":
+                    await bot.call_api("send_group_msg", group_id=chat_id, message=message)
+                else:
+                    await bot.call_api("send_private_msg", user_id=chat_id, message=message)
+            except Exception as e:
+                logger.error(f"Push state transitions to {chat_key} failed: {e}")
+
+    async def stop(self) -> None:
+        await self.flush()
+        if self.__send_task is not None:
+            await asyncio.gather(self.__send_task, return_exceptions=True)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+import time
+
+from nonebot.log import logger
+
+from .cache import ServiceKey
+from .history import percentile
+from .protocol import BaseProtocol
+
+
+class _BreakerState:
+    __slots__ = ("service", "failures", "open_until")
+
+    def __init__(self, service: BaseProtocol) -> None:
+        self.service = service
+        self.failures = 0
+        self.open_until = 0.0
+
+
+class CircuitBreaker:
+    """
+    按服务熔断
+
+    连续失败 threshold 次后熔断，熔断期间不再发起探测，熔断时间从 backoff 秒开始每次失败翻倍，最长 max_backoff 秒
+    熔断到期后放行一次探测（半开），成功则恢复，失败则继续熔断；服务实例被替换（如修改参数）后状态重置
+    """
+
+    def __init__(self, threshold: int = 3, backoff: float = 30.0, max_backoff: float = 300.0) -> None:
+        self.__threshold = threshold
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__states: Dict[ServiceKey, _BreakerState] = {}
+
+    def configure(self, threshold: int = 3, backoff: float = 30.0, max_backoff: float = 300.0) -> None:
+        self.__threshold = threshold
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__states.clear()
+
+    def __get(self, key: ServiceKey, service: BaseProtocol) -> Optional[_BreakerState]:
+        state = self.__states.get(key)
+        if state is not None and state.service is not service:
+            del self.__states[key]
+            return None
+        return state
+
+    def is_open(self, key: ServiceKey, service: BaseProtocol) -> bool:
+        """
+        是否处于熔断期间，熔断到期后返回 False 以放行半开探测
+        """
+        if self.__threshold <= 0:
+            return False
+        state = self.__get(key, service)
+        return state is not None and time.time() < state.open_until
+
+    def record(self, key: ServiceKey, service: BaseProtocol, success: bool) -> None:
+        if self.__threshold <= 0:
+            return
+        state = self.__get(key, service)
+        if success:
+            if state is not None:
+                if state.failures >= self.__threshold:
+                    logger.info(f"Circuit of {key} closed")
+                del self.__states[key]
+            return
+        if state is None:
+            state = _BreakerState(service)
+            self.__states[key] = state
+        state.failures += 1
+        if state.failures >= self.__threshold:
+            backoff = min(self.__backoff * 2 ** min(state.failures - self.__threshold, 32), self.__max_backoff)
+            state.open_until = time.time() + backoff
+            logger.debug(f"Circuit of {key} opened for {backoff:.0f}s")
+
+    def open_count(self) -> int:
+        now = time.time()
+        return sum(1 for i in self.__states.values() if now < i.open_until)
+
+    def discard(self, key: ServiceKey) -> None:
+        self.__states.pop(key, None)
+
+
+class AdaptiveTimeout:
+    """
+    自适应超时
+
+    以近期成功探测耗时的 p99 乘以 factor 作为超时时间，限制在 minimum 与服务配置的超时时间之间，样本不足时使用配置值
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        factor: float = 3.0,
+        minimum: float = 0.5,
+        samples: int = 100,
+        min_samples: int = 20,
+    ) -> None:
+        self.configure(enabled, factor, minimum, samples, min_samples)
+
+    def configure(
+        self,
+        enabled: bool = False,
+        factor: float = 3.0,
+        minimum: float = 0.5,
+        samples: int = 100,
+        min_samples: int = 20,
+    ) -> None:
+        self.enabled = enabled
+        self.factor = factor
+        self.minimum = minimum
+        self.samples = samples
+        self.min_samples = min_samples
+
+    def compute(self, latencies: List[float], configured: float) -> Optional[float]:
+        if not self.enabled or len(latencies) < self.min_samples:
+            return None
+        latencies = sorted(latencies)
+        return max(self.minimum, min(configured, percentile(latencies, 0.99) * self.factor))
+
+
+circuit_breaker = CircuitBreaker()
+adaptive_timeout = AdaptiveTimeout()
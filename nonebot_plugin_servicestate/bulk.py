@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+import csv
+import io
+import json
+
+from .exception import ImportFormatError
+
+# 批量导入导出的每一项为一个服务：协议、所属群组（独立服务为空）及协议参数
+ENTRY_META_KEYS = ("protocol", "group")
+# CSV 中优先排列的列，其余参数按名称排序
+CSV_LEADING_COLUMNS = ("protocol", "group", "name", "host")
+
+
+def flatten_config(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将配置文件格式（service / service_group）展开为逐项的服务列表
+    """
+    entries: List[Dict[str, Any]] = []
+    for protocol, services in config.get("service", {}).items():
+        for service in services:
+            entries.append(dict(service, protocol=protocol))
+    for group, group_config in config.get("service_group", {}).items():
+        for protocol, services in group_config.items():
+            for service in services:
+                entries.append(dict(service, protocol=protocol, group=group))
+    return entries
+
+
+def parse_entries(text: str) -> List[Dict[str, Any]]:
+    """
+    解析批量导入内容：以 [ 或 { 开头的按 JSON 解析，其余按带表头的 CSV 解析，CSV 中的空单元格使用默认值
+    """
+    text = text.strip().lstrip("\ufeff")
+    if not text:
+        raise ImportFormatError("内容为空")
+    if text[0] in "[{":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ImportFormatError(f"JSON 解析错误：{e}")
+        if isinstance(data, dict):
+            if "service" not in data and "service_group" not in data:
+                raise ImportFormatError("JSON 应为服务列表或配置文件格式")
+            return flatten_config(data)
+        if not all(isinstance(i, dict) for i in data):
+            raise ImportFormatError("JSON 服务列表中的每一项应为对象")
+        return data
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or "protocol" not in reader.fieldnames:
+        raise ImportFormatError("CSV 表头中缺少 protocol 列")
+    entries = []
+    try:
+        for row in reader:
+            if None in row:
+                raise ImportFormatError(f"CSV 第 {reader.line_num} 行的列数多于表头")
+            entries.append({i: j for i, j in row.items() if j is not None and j != ""})
+    except csv.Error as e:
+        raise ImportFormatError(f"CSV 解析错误：{e}")
+    return entries
+
+
+def dump_entries(entries: List[Dict[str, Any]], fmt: str = "json") -> str:
+    """
+    以 json 或 csv 格式导出服务列表，导出内容可直接用于批量导入
+    """
+    if fmt == "json":
+        return json.dumps(
+            [{i: j for i, j in entry.items() if i != "group" or j is not None} for entry in entries],
+            ensure_ascii=False,
+            indent=4,
+        )
+    if fmt != "csv":
+        raise ValueError(f"Unknown export format {fmt}")
+    columns = set()
+    for entry in entries:
+        columns.update(entry)
+    fieldnames = list(CSV_LEADING_COLUMNS) + sorted(columns.difference(CSV_LEADING_COLUMNS))
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows({i: "" if j is None else j for i, j in entry.items()} for entry in entries)
+    return output.getvalue()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple, NamedTuple
+import time
+
+from .protocol import BaseProtocol, ProbeResult
+
+# (群组名称, 服务名称)，独立服务的群组名称为 None
+ServiceKey = Tuple[Optional[str], str]
+
+
+class CacheEntry(NamedTuple):
+    service: BaseProtocol
+    result: ProbeResult
+    timestamp: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+
+class ResultCache:
+    """
+    探测结果缓存
+
+    记录每个服务最近一次的探测结果及探测时间，服务实例被替换（如修改参数）后旧结果自动失效
+    """
+
+    def __init__(self) -> None:
+        self.__entries: Dict[ServiceKey, CacheEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def set(self, key: ServiceKey, service: BaseProtocol, result: ProbeResult) -> CacheEntry:
+        entry = CacheEntry(service, result, result.timestamp or time.time())
+        self.__entries[key] = entry
+        return entry
+
+    def get(self, key: ServiceKey, service: BaseProtocol) -> Optional[CacheEntry]:
+        entry = self.__entries.get(key)
+        if entry is None or entry.service is not service:
+            return None
+        return entry
+
+    def discard(self, key: ServiceKey) -> None:
+        self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.__entries.clear()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+from pathlib import Path
+import json
+
+from nonebot.log import logger
+
+from .persistence import atomic_write, dump_config
+
+
+def get_chat_key(event: Any) -> str:
+    """
+    群聊以群号区分，其余以用户区分
+    """
+    group_id = getattr(event, "group_id", None)
+    if group_id is not None:
+        return f"group_{group_id}"
+    return f"private_{event.get_user_id()}"
+
+
+def parse_chat_key(chat_key: str) -> Tuple[str, int]:
+    """
+    get_chat_key 的逆过程，返回 ("group" | "private", 群号或用户 ID)
+    """
+    chat_type, _, chat_id = chat_key.partition("_")
+    return chat_type, int(chat_id)
+
+
+class ChatSettings:
+    """
+    按会话保存的设置，首次读取时载入，修改后立即写入
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.__path = path
+        self.__settings: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def __load(self) -> Dict[str, Dict[str, Any]]:
+        if self.__settings is None:
+            self.__settings = {}
+            if self.__path.is_file():
+                try:
+                    with open(self.__path, "r", encoding="utf-8") as f:
+                        self.__settings = json.loads(f.read())
+                except ValueError as e:
+                    logger.error(f"Load chat settings failed: {e}")
+        return self.__settings
+
+    def get(self, chat_key: str, key: str, default: Any = None) -> Any:
+        return self.__load().get(chat_key, {}).get(key, default)
+
+    def find(self, key: str) -> Dict[str, Any]:
+        """
+        返回设置了 key 的所有会话及对应的值，值为 None 的视为未设置
+        """
+        return {i: j[key] for i, j in self.__load().items() if j.get(key) is not None}
+
+    def set(self, chat_key: str, key: str, value: Any) -> None:
+        settings = self.__load()
+        settings.setdefault(chat_key, {})[key] = value
+        atomic_write(self.__path, dump_config(settings))
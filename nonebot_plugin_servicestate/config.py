@@ -0,0 +1,82 @@
+from typing import Optional
+from pydantic import BaseModel, Extra
+
+from nonebot import get_driver
+
+
+class Config(BaseModel, extra=Extra.ignore):
+    # HTTP 协议共享连接池上限，None 为不限制
+    servicestate_http_max_connections: Optional[int] = 100
+    # HTTP 协议共享连接池中保持空闲的连接上限
+    servicestate_http_max_keepalive_connections: Optional[int] = 20
+    # HTTP 协议空闲连接的保持时间（秒）
+    servicestate_http_keepalive_expiry: Optional[float] = 30.0
+    # 开启 http2 的服务对同一源同时进行的请求数上限
+    servicestate_http2_max_streams: int = 100
+    # 是否在后台按各服务的 interval 参数定时探测
+    servicestate_scheduler_enabled: bool = True
+    # 后台调度器检查待探测服务的间隔（秒）
+    servicestate_scheduler_tick: float = 1.0
+    # 后台探测间隔的随机浮动比例，新服务的首次探测会在一个探测间隔内随机分散
+    servicestate_scheduler_jitter: float = 0.1
+    # 同时进行的探测数量上限，0 为不限制
+    servicestate_max_concurrency: int = 64
+    # 对同一主机同时进行的探测数量上限，0 为不限制
+    servicestate_max_per_host: int = 4
+    # 探测工作进程数，服务按名称固定分配到各进程中探测，机器人进程只合并结果，0 为在机器人进程内探测
+    servicestate_probe_workers: int = 0
+    # 未单独设置的会话是否以流式回复服务状态
+    servicestate_stream_default: bool = False
+    # 流式回复时首次回复前等待探测完成的时间（秒），之后完成的结果补充发送
+    servicestate_stream_first_wait: float = 1.0
+    # 探测目标相同的探测完成后，结果在此时间（秒）内直接复用，0 为只合并同时进行的探测
+    servicestate_probe_result_ttl: float = 1.0
+    # 是否根据近期探测耗时自动缩短超时时间，不超过服务配置的 timeout
+    servicestate_adaptive_timeout: bool = False
+    # 自适应超时为近期成功探测耗时 p99 的倍数
+    servicestate_adaptive_timeout_factor: float = 3.0
+    # 自适应超时的下限（秒）
+    servicestate_adaptive_timeout_min: float = 0.5
+    # 连续失败多少次后熔断，熔断期间直接返回故障而不发起探测，0 为不熔断
+    servicestate_breaker_threshold: int = 3
+    # 首次熔断的时长（秒），之后每次半开探测失败翻倍
+    servicestate_breaker_backoff: float = 30.0
+    # 熔断时长上限（秒）
+    servicestate_breaker_max_backoff: float = 300.0
+    # 连续多少次故障后确认为故障并推送
+    servicestate_alert_down_threshold: int = 2
+    # 连续多少次可用后确认为恢复并推送
+    servicestate_alert_up_threshold: int = 2
+    # 抖动检测的时间窗口（秒）
+    servicestate_alert_flap_window: float = 600.0
+    # 时间窗口内状态变化达到此次数时视为抖动，只推送一次，0 为不检测抖动
+    servicestate_alert_flap_threshold: int = 4
+    # 合并推送的时间窗口（秒），窗口内的状态变化合并为一条消息
+    servicestate_alert_batch_window: float = 1.0
+    # 服务状态中是否总是显示探测耗时
+    servicestate_show_latency: bool = False
+    # 服务状态每页显示的服务数量，0 为不分页
+    servicestate_status_page_size: int = 50
+    # 每个服务在内存中保留的探测历史条数
+    servicestate_history_capacity: int = 10080
+    # 探测历史日志大小上限（字节），超过后压缩
+    servicestate_history_max_log_size: int = 16 * 1024 * 1024
+    # 探测历史写入磁盘的间隔（秒）
+    servicestate_history_flush_interval: float = 10.0
+    # 合并保存配置的时间窗口（秒），窗口内的多次修改只写入一次
+    servicestate_config_save_debounce: float = 0.5
+    # 是否以日志模式保存配置，只追加变更的服务记录
+    servicestate_config_journal: bool = False
+    # 日志模式下日志记录数上限，超过后重写完整配置
+    servicestate_config_journal_max_records: int = 1000
+    # DNS 解析结果的缓存时间（秒）
+    servicestate_dns_cache_ttl: float = 60.0
+    # DNS 解析失败的缓存时间（秒）
+    servicestate_dns_negative_ttl: float = 10.0
+    # DNS 缓存的主机名数量上限，超过后淘汰最久未使用的记录
+    servicestate_dns_cache_size: int = 1024
+    # 指标导出的 HTTP 路径，需使用 FastAPI 等反向驱动器，默认为 None 不导出
+    servicestate_metrics_path: Optional[str] = None
+
+
+plugin_config = Config.parse_obj(get_driver().config)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+import asyncio
+
+from nonebot.log import logger
+
+from .cache import ServiceKey
+from .protocol import ProbeResult
+from .metrics import transitions
+
+EVENT_DOWN = "down"
+EVENT_UP = "up"
+EVENT_FLAPPING = "flapping"
+
+
+class TransitionEvent:
+    """
+    服务状态变化事件
+
+    key：(群组名称, 服务名称)，独立服务的群组名称为 None
+    kind：down 为变为故障，up 为恢复可用，flapping 为短时间内反复变化
+    result：触发本事件的探测结果
+    changes：flapping 时为抖动窗口内的状态变化次数
+    """
+
+    __slots__ = ("key", "kind", "result", "changes")
+
+    def __init__(self, key: ServiceKey, kind: str, result: ProbeResult, changes: int = 0) -> None:
+        self.key = key
+        self.kind = kind
+        self.result = result
+        self.changes = changes
+
+    @property
+    def display_name(self) -> str:
+        return self.key[1] if self.key[0] is None else f"{self.key[0]}@{self.key[1]}"
+
+    def __repr__(self) -> str:
+        return f"TransitionEvent(key={self.key}, kind={self.kind}, result={self.result}, changes={self.changes})"
+
+
+EventHandler = Callable[[TransitionEvent], Awaitable[None]]
+
+
+class EventBus:
+    """
+    状态变化事件总线
+
+    处理函数为接收 TransitionEvent 的协程函数，每个事件在独立的任务中分发给所有处理函数，处理函数的异常只记录日志
+    """
+
+    def __init__(self) -> None:
+        self.__handlers: List[EventHandler] = []
+        self.__tasks: Set[asyncio.Future] = set()
+
+    def subscribe(self, handler: EventHandler) -> EventHandler:
+        """
+        注册处理函数，可作为装饰器使用
+        """
+        if handler not in self.__handlers:
+            self.__handlers.append(handler)
+        return handler
+
+    def unsubscribe(self, handler: EventHandler) -> None:
+        if handler in self.__handlers:
+            self.__handlers.remove(handler)
+
+    def publish(self, event: TransitionEvent) -> None:
+        for handler in tuple(self.__handlers):
+            task = asyncio.ensure_future(self.__dispatch(handler, event))
+            self.__tasks.add(task)
+            task.add_done_callback(self.__tasks.discard)
+
+    @staticmethod
+    async def __dispatch(handler: EventHandler, event: TransitionEvent) -> None:
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error(f"Transition handler {getattr(handler, '__name__', handler)} failed: {e}")
+
+
+class _ServiceState:
+    __slots__ = ("confirmed", "notified", "streak", "changes", "flapping")
+
+    def __init__(self) -> None:
+        # 连续结果确认后的状态，首次探测前视为可用，启动时已故障的服务也会发出故障事件
+        self.confirmed = True
+        # 最近一次通知的状态
+        self.notified = True
+        # 与 confirmed 不同的连续结果数
+        self.streak = 0
+        # 抖动窗口内状态确认变化的时间
+        self.changes: Deque[float] = deque()
+        self.flapping = False
+
+
+class TransitionDetector:
+    """
+    状态变化检测
+
+    每个探测结果与该服务之前确认的状态比较，耗时与服务数量无关，只在状态变化时向事件总线发布事件
+    连续 down_threshold 次故障才确认为故障，连续 up_threshold 次可用才确认为恢复，避免偶发失败产生通知
+    flap_window 秒内确认的状态变化达到 flap_threshold 次时只发布一次 flapping 事件，此后不再逐次通知，
+    状态保持 flap_window 秒不变后按当时的状态发布 down 或 up 事件；flap_threshold 为 0 时不检测抖动
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        down_threshold: int = 2,
+        up_threshold: int = 2,
+        flap_window: float = 600.0,
+        flap_threshold: int = 4,
+    ) -> None:
+        self.__bus = bus
+        self.__down_threshold = down_threshold
+        self.__up_threshold = up_threshold
+        self.__flap_window = flap_window
+        self.__flap_threshold = flap_threshold
+        self.__states: Dict[ServiceKey, _ServiceState] = {}
+
+    def configure(
+        self,
+        down_threshold: int = 2,
+        up_threshold: int = 2,
+        flap_window: float = 600.0,
+        flap_threshold: int = 4,
+    ) -> None:
+        self.__down_threshold = max(down_threshold, 1)
+        self.__up_threshold = max(up_threshold, 1)
+        self.__flap_window = flap_window
+        self.__flap_threshold = flap_threshold
+        self.__states.clear()
+
+    def is_flapping(self, key: ServiceKey) -> bool:
+        state = self.__states.get(key)
+        return state is not None and state.flapping
+
+    def discard(self, key: ServiceKey) -> None:
+        self.__states.pop(key, None)
+
+    def observe(self, key: ServiceKey, result: ProbeResult) -> Optional[TransitionEvent]:
+        """
+        记录一次探测结果，状态变化时发布并返回事件
+        """
+        event = self.__observe(key, result)
+        if event is not None:
+            transitions.inc((event.kind,))
+            logger.info(f"Service {event.display_name} {event.kind}")
+            self.__bus.publish(event)
+        return event
+
+    def __observe(self, key: ServiceKey, result: ProbeResult) -> Optional[TransitionEvent]:
+        state = self.__states.get(key)
+        if state is None:
+            state = self.__states[key] = _ServiceState()
+        status = bool(result)
+        timestamp = result.timestamp or 0.0
+        changes = state.changes
+        while changes and changes[0] <= timestamp - self.__flap_window:
+            changes.popleft()
+        if status == state.confirmed:
+            state.streak = 0
+            if state.flapping and not changes:
+                # 抖动结束，通知当前状态
+                state.flapping = False
+                state.notified = status
+                return TransitionEvent(key, EVENT_UP if status else EVENT_DOWN, result)
+            return None
+        state.streak += 1
+        if state.streak < (self.__down_threshold if state.confirmed else self.__up_threshold):
+            return None
+        state.confirmed = status
+        state.streak = 0
+        if self.__flap_threshold > 0:
+            changes.append(timestamp)
+            if state.flapping:
+                return None
+            if len(changes) >= self.__flap_threshold:
+                state.flapping = True
+                return TransitionEvent(key, EVENT_FLAPPING, result, len(changes))
+        if status == state.notified:
+            return None
+        state.notified = status
+        return TransitionEvent(key, EVENT_UP if status else EVENT_DOWN, result)
+
+
+event_bus = EventBus()
+transition_detector = TransitionDetector(event_bus)
@@ -50,3 +50,30 @@ class NameEscapeCharacterCountError(Exception):
 
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
+
+
+class DNSResolveError(Exception):
+    """
+    主机名解析失败
+    """
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class ImportFormatError(Exception):
+    """
+    批量导入内容无法解析
+    """
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class ImportInvalidError(Exception):
+    """
+    批量导入校验失败，args 为全部错误信息
+    """
+
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+from functools import partial
+from urllib.parse import urlsplit
+import asyncio
+import json
+import time
+
+from nonebot.log import logger
+
+from .protocol import BaseProtocol, ProbeResult
+from .metrics import probe_queue_wait, probes_coalesced, probes_in_flight
+from .worker import worker_pool
+
+
+class ProbeStats:
+    """
+    探测耗时统计，排队等待时间与探测时间分开记录
+    """
+
+    __slots__ = ("count", "coalesced", "queue_wait_total", "queue_wait_max", "probe_time_total", "probe_time_max")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self.coalesced = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.probe_time_total = 0.0
+        self.probe_time_max = 0.0
+
+    def record(self, queue_wait: float, probe_time: float) -> None:
+        self.count += 1
+        self.queue_wait_total += queue_wait
+        self.probe_time_total += probe_time
+        if queue_wait > self.queue_wait_max:
+            self.queue_wait_max = queue_wait
+        if probe_time > self.probe_time_max:
+            self.probe_time_max = probe_time
+
+    @property
+    def queue_wait_avg(self) -> float:
+        return self.queue_wait_total / self.count if self.count else 0.0
+
+    @property
+    def probe_time_avg(self) -> float:
+        return self.probe_time_total / self.count if self.count else 0.0
+
+
+class _HostSlot:
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ProbeExecutor:
+    """
+    探测执行器
+
+    限制全局同时进行的探测数量以及对同一主机同时进行的探测数量，0 为不限制，多路复用的协议（如 HTTP/2）不受主机数量限制
+    探测目标相同的并发请求合并为一次探测，完成后的结果在 result_ttl 秒内直接复用
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_per_host: int = 4, result_ttl: float = 1.0) -> None:
+        self.__max_concurrency = max_concurrency
+        self.__max_per_host = max_per_host
+        self.__result_ttl = result_ttl
+        self.__global_semaphore: Optional[asyncio.Semaphore] = None
+        self.__host_slots: Dict[str, _HostSlot] = {}
+        self.__inflight: Dict[str, asyncio.Future] = {}
+        # 按完成时间先后排列，便于从头部清理过期结果
+        self.__recent: Dict[str, Tuple[float, ProbeResult]] = {}
+        self.stats = ProbeStats()
+
+    def configure(self, max_concurrency: int = 64, max_per_host: int = 4, result_ttl: float = 1.0) -> None:
+        self.__max_concurrency = max_concurrency
+        self.__max_per_host = max_per_host
+        self.__result_ttl = result_ttl
+        self.__global_semaphore = None
+        self.__host_slots.clear()
+        self.__recent.clear()
+
+    @staticmethod
+    def target_key(service: BaseProtocol) -> str:
+        """
+        探测目标标识：协议名称与除 name、interval 外的全部参数
+        """
+        config = service.export()
+        config.pop("name", None)
+        config.pop("interval", None)
+        return service._PROTOCOL_NAME + json.dumps(config, sort_keys=True, default=str)
+
+    @staticmethod
+    def get_host(service: BaseProtocol) -> str:
+        host = str(service.host)
+        if "://" in host:
+            return urlsplit(host).hostname or host
+        return host
+
+    async def run(self, service: BaseProtocol) -> ProbeResult:
+        key = self.target_key(service)
+        recent = self.__recent.get(key)
+        if recent is not None and time.monotonic() - recent[0] < self.__result_ttl:
+            self.__record_coalesced(service)
+            return recent[1]
+        future = self.__inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.__run(service))
+            self.__inflight[key] = future
+            future.add_done_callback(partial(self.__on_done, key))
+        else:
+            self.__record_coalesced(service)
+        # 单个调用方被取消时不影响其他等待同一探测的调用方
+        return await asyncio.shield(future)
+
+    def __record_coalesced(self, service: BaseProtocol) -> None:
+        self.stats.coalesced += 1
+        probes_coalesced.inc((service._PROTOCOL_NAME,))
+
+    def __on_done(self, key: str, future: asyncio.Future) -> None:
+        self.__inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None or self.__result_ttl <= 0:
+            return
+        now = time.monotonic()
+        self.__recent.pop(key, None)
+        self.__recent[key] = (now, future.result())
+        for i in list(self.__recent):
+            if now - self.__recent[i][0] < self.__result_ttl:
+                break
+            del self.__recent[i]
+
+    async def __run(self, service: BaseProtocol) -> ProbeResult:
+        host = self.get_host(service)
+        enqueue_time = time.perf_counter()
+        host_slot = None if service.multiplexed else self.__acquire_host_slot(host)
+        global_semaphore = self.__get_global_semaphore()
+        try:
+            if host_slot is not None:
+                await host_slot.semaphore.acquire()
+            try:
+                if global_semaphore is not None:
+                    await global_semaphore.acquire()
+                in_flight_labels = (service._PROTOCOL_NAME,)
+                probes_in_flight.inc(in_flight_labels)
+                try:
+                    start_time = time.perf_counter()
+                    result = await worker_pool.probe(service)
+                    probe_time = time.perf_counter() - start_time
+                finally:
+                    probes_in_flight.dec(in_flight_labels)
+                    if global_semaphore is not None:
+                        global_semaphore.release()
+            finally:
+                if host_slot is not None:
+                    host_slot.semaphore.release()
+        finally:
+            self.__release_host_slot(host, host_slot)
+        queue_wait = start_time - enqueue_time
+        self.stats.record(queue_wait, probe_time)
+        probe_queue_wait.observe(queue_wait, (service._PROTOCOL_NAME,))
+        logger.debug(f"Probe {service.name} -> queue {queue_wait * 1000:.1f}ms | probe {probe_time * 1000:.1f}ms")
+        return result
+
+    def __get_global_semaphore(self) -> Optional[asyncio.Semaphore]:
+        # 信号量需在事件循环内创建
+        if self.__max_concurrency <= 0:
+            return None
+        if self.__global_semaphore is None:
+            self.__global_semaphore = asyncio.Semaphore(self.__max_concurrency)
+        return self.__global_semaphore
+
+    def __acquire_host_slot(self, host: str) -> Optional[_HostSlot]:
+        if self.__max_per_host <= 0:
+            return None
+        slot = self.__host_slots.get(host)
+        if slot is None:
+            slot = _HostSlot(self.__max_per_host)
+            self.__host_slots[host] = slot
+        slot.users += 1
+        return slot
+
+    def __release_host_slot(self, host: str, slot: Optional[_HostSlot]) -> None:
+        if slot is None:
+            return
+        slot.users -= 1
+        if slot.users == 0 and self.__host_slots.get(host) is slot:
+            del self.__host_slots[host]
+
+
+probe_executor = ProbeExecutor()
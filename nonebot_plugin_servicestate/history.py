@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from typing import Dict, List, Optional, Iterable, NamedTuple, Set, Tuple
+from pathlib import Path
+import asyncio
+import json
+import math
+import os
+import time
+
+from nonebot.log import logger
+
+from .cache import ServiceKey
+from .protocol import ProbeResult
+
+
+class HistoryStats(NamedTuple):
+    count: int
+    up_count: int
+    p50: Optional[float]
+    p95: Optional[float]
+
+    @property
+    def uptime(self) -> Optional[float]:
+        return self.up_count / self.count if self.count else None
+
+
+def percentile(sorted_values: List[float], rate: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * rate))]
+
+
+class ServiceHistory:
+    """
+    单个服务的探测历史环形缓冲区
+
+    时间戳、耗时与状态分别保存在 array / bytearray 中，写满后覆盖最旧的记录
+    """
+
+    __slots__ = ("capacity", "timestamps", "latencies", "status", "cursor")
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.timestamps = array("d")
+        self.latencies = array("f")
+        self.status = bytearray()
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def append(self, timestamp: float, status: bool, latency: Optional[float]) -> None:
+        latency = math.nan if latency is None else latency
+        if len(self.status) < self.capacity:
+            self.timestamps.append(timestamp)
+            self.latencies.append(latency)
+            self.status.append(status)
+            return
+        self.timestamps[self.cursor] = timestamp
+        self.latencies[self.cursor] = latency
+        self.status[self.cursor] = status
+        self.cursor = (self.cursor + 1) % self.capacity
+
+    def iter_newest(self) -> Iterable[int]:
+        """
+        由新到旧遍历记录下标
+        """
+        size = len(self.status)
+        newest = (self.cursor - 1) % size if size == self.capacity else size - 1
+        for offset in range(size):
+            yield (newest - offset) % size
+
+    def iter_oldest(self) -> Iterable[int]:
+        size = len(self.status)
+        oldest = self.cursor if size == self.capacity else 0
+        for offset in range(size):
+            yield (oldest + offset) % size
+
+    def segments(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        由旧到新的连续下标区间 [start, end)，写满后分为两段
+        """
+        size = len(self.status)
+        if size == self.capacity and self.cursor:
+            return ((self.cursor, size), (0, self.cursor))
+        return ((0, size),)
+
+    def copy(self) -> ServiceHistory:
+        history = ServiceHistory(self.capacity)
+        history.timestamps = array("d", self.timestamps)
+        history.latencies = array("f", self.latencies)
+        history.status = bytearray(self.status)
+        history.cursor = self.cursor
+        return history
+
+    def recent_latencies(self, count: int) -> List[float]:
+        """
+        最近 count 条记录中成功探测的耗时
+        """
+        latencies: List[float] = []
+        for offset, i in enumerate(self.iter_newest()):
+            if offset >= count:
+                break
+            if self.status[i] and not math.isnan(self.latencies[i]):
+                latencies.append(self.latencies[i])
+        return latencies
+
+    def stats(self, since: float) -> HistoryStats:
+        """
+        统计 since 之后的记录，按时间二分查找起点，计数与筛选以切片完成，不逐条遍历窗口外的记录
+        """
+        count = 0
+        up_count = 0
+        latencies: List[float] = []
+        for start, end in self.segments():
+            begin = bisect_left(self.timestamps, since, start, end)
+            if begin >= end:
+                continue
+            status = self.status[begin:end]
+            count += end - begin
+            up_count += status.count(1)
+            latencies.extend(i for i in compress(self.latencies[begin:end], status) if not math.isnan(i))
+        latencies.sort()
+        return HistoryStats(count, up_count, percentile(latencies, 0.5), percentile(latencies, 0.95))
+
+
+class HistoryStore:
+    """
+    探测历史存储
+
+    内存中为每个服务保留固定容量的环形缓冲区，同时追加写入磁盘日志，日志超过大小上限时由内存数据重写压缩
+    压缩后的日志本身超过上限时，下次压缩在日志增长到压缩后大小的两倍时才进行，避免每次写入都重写日志
+    """
+
+    def __init__(self, path: Path, capacity: int = 10080, max_log_size: int = 16 * 1024 * 1024) -> None:
+        self.__path = path
+        self.__capacity = capacity
+        self.__max_log_size = max_log_size
+        self.__histories: Dict[ServiceKey, ServiceHistory] = {}
+        self.__pending: List[str] = []
+        self.__flush_task: Optional[asyncio.Task] = None
+        self.__flushing: Optional[asyncio.Future] = None
+        # 上次压缩后的日志大小
+        self.__compacted_size = 0
+
+    def configure(self, capacity: int = 10080, max_log_size: int = 16 * 1024 * 1024) -> None:
+        self.__capacity = capacity
+        self.__max_log_size = max_log_size
+
+    def __getitem__(self, key: ServiceKey) -> ServiceHistory:
+        return self.__histories[key]
+
+    def __contains__(self, key: ServiceKey) -> bool:
+        return key in self.__histories
+
+    def __get_or_create(self, key: ServiceKey) -> ServiceHistory:
+        history = self.__histories.get(key)
+        if history is None:
+            history = ServiceHistory(self.__capacity)
+            self.__histories[key] = history
+        return history
+
+    def record(self, key: ServiceKey, result: ProbeResult) -> None:
+        timestamp = result.timestamp or time.time()
+        self.__get_or_create(key).append(timestamp, result.status, result.latency)
+        self.__pending.append(
+            self.__dump_line(key, timestamp, result.status, result.latency)
+        )
+
+    def stats(self, key: ServiceKey, window: float) -> HistoryStats:
+        history = self.__histories.get(key)
+        if history is None:
+            return HistoryStats(0, 0, None, None)
+        return history.stats(time.time() - window)
+
+    def recent_latencies(self, key: ServiceKey, count: int) -> List[float]:
+        history = self.__histories.get(key)
+        return [] if history is None else history.recent_latencies(count)
+
+    @staticmethod
+    def __dump_line(key: ServiceKey, timestamp: float, status: bool, latency: Optional[float]) -> str:
+        if latency is not None and math.isnan(latency):
+            latency = None
+        latency = None if latency is None else round(latency, 6)
+        return json.dumps([round(timestamp, 3), key[0], key[1], int(status), latency], ensure_ascii=False) + "\n"
+
+    def load(self) -> None:
+        """
+        读取磁盘日志填充环形缓冲区，仅在启动时执行一次
+        """
+        self.__histories.clear()
+        if not self.__path.is_file():
+            return
+        with open(self.__path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    timestamp, group_name, name, status, latency = json.loads(line)
+                except ValueError:
+                    # 进程意外退出时最后一行可能不完整
+                    continue
+                self.__get_or_create((group_name, name)).append(timestamp, bool(status), latency)
+        logger.debug(f"Loaded probe history of {len(self.__histories)} services")
+
+    def flush(self, keep: Optional[Set[ServiceKey]] = None) -> None:
+        """
+        将待写入的记录追加到日志，日志超过大小上限时压缩
+        """
+        self.__append(self.__take_pending())
+        if self.__need_compact():
+            self.__replace(self.__snapshot(keep))
+
+    def compact(self, keep: Optional[Set[ServiceKey]] = None) -> None:
+        """
+        以内存中的环形缓冲区重写日志，丢弃超出容量及已不存在服务的记录
+        """
+        self.__replace(self.__snapshot(keep))
+
+    def __take_pending(self) -> str:
+        pending, self.__pending = self.__pending, []
+        return "".join(pending)
+
+    def __need_compact(self) -> bool:
+        if not self.__path.is_file():
+            return False
+        return self.__path.stat().st_size > max(self.__max_log_size, self.__compacted_size * 2)
+
+    def __snapshot(self, keep: Optional[Set[ServiceKey]]) -> Dict[ServiceKey, ServiceHistory]:
+        """
+        在事件循环中复制环形缓冲区，之后可在线程池中写入
+        """
+        if keep is not None:
+            for key in self.__histories.keys() - keep:
+                del self.__histories[key]
+        # 快照中已包含所有待写入的记录
+        self.__pending = []
+        return {key: history.copy() for key, history in self.__histories.items()}
+
+    def __append(self, content: str) -> None:
+        if not content:
+            return
+        if not self.__path.parent.is_dir():
+            self.__path.parent.mkdir(parents=True)
+        with open(self.__path, "a", encoding="utf-8") as f:
+            f.write(content)
+
+    def __replace(self, snapshot: Dict[ServiceKey, ServiceHistory]) -> None:
+        temp_path = self.__path.with_name(self.__path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for key, history in snapshot.items():
+                # 每个服务的名称只序列化一次
+                group_name = json.dumps(key[0], ensure_ascii=False)
+                name = json.dumps(key[1], ensure_ascii=False)
+                timestamps, status, latencies = history.timestamps, history.status, history.latencies
+                f.writelines(
+                    f"[{round(timestamps[i], 3)}, {group_name}, {name}, {status[i]}, "
+                    f"{'null' if math.isnan(latencies[i]) else round(latencies[i], 6)}]\n"
+                    for i in history.iter_oldest()
+                )
+        os.replace(temp_path, self.__path)
+        self.__compacted_size = self.__path.stat().st_size
+        if self.__compacted_size > self.__max_log_size:
+            logger.warning(
+                f"Probe history of {len(snapshot)} services takes {self.__compacted_size} bytes, "
+                f"larger than the log size limit, consider a smaller history capacity"
+            )
+        logger.debug(f"Compacted probe history to {self.__compacted_size} bytes")
+
+    def start(self, flush_interval: float, keep_func=None) -> None:
+        if self.__flush_task is not None and not self.__flush_task.done():
+            return
+        self.__flush_task = asyncio.get_event_loop().create_task(self.__flush_loop(flush_interval, keep_func))
+
+    async def stop(self) -> None:
+        if self.__flush_task is not None:
+            self.__flush_task.cancel()
+            await asyncio.gather(self.__flush_task, return_exceptions=True)
+            self.__flush_task = None
+        # 等待线程池中进行的写入完成，避免与最后一次写入交错
+        if self.__flushing is not None:
+            await asyncio.gather(self.__flushing, return_exceptions=True)
+        self.flush()
+
+    async def __flush_loop(self, flush_interval: float, keep_func) -> None:
+        while True:
+            await asyncio.sleep(flush_interval)
+            self.__flushing = asyncio.ensure_future(self.__flush_async(keep_func))
+            await asyncio.shield(self.__flushing)
+
+    async def __flush_async(self, keep_func) -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            # 内存数据只在事件循环中读取与复制，序列化及文件读写放到线程池中执行
+            await loop.run_in_executor(None, self.__append, self.__take_pending())
+            if await loop.run_in_executor(None, self.__need_compact):
+                snapshot = self.__snapshot(None if keep_func is None else keep_func())
+                await loop.run_in_executor(None, self.__replace, snapshot)
+        except Exception as e:
+            logger.error(f"Flush probe history failed: {e}")
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import Dict, List, Any, Tuple, Union
+from typing import Dict, List, Any, Tuple, Union, Optional, Iterator, AsyncIterator, Set
+from contextlib import contextmanager
+from functools import partial, wraps
+from asyncio import FIRST_COMPLETED, Future, ensure_future, gather, get_event_loop, shield, wait
 from pathlib import Path
-import json
+import time
 
+from pydantic import ValidationError
 from nonebot.log import logger
 
 from nonebot.plugin.load import require
@@ -11,83 +15,343 @@ from nonebot.plugin.load import require
 require("nonebot_plugin_localstore")
 import nonebot_plugin_localstore as store
 
-from .service import ServiceStatus, ServiceStatusGroup, BaseProtocol, SupportProtocol
+from .service import ServiceStatus, ServiceStatusGroup, BaseProtocol, SupportProtocol, ProbeResult
+from .cache import ResultCache, ServiceKey
+from .executor import probe_executor
+from .breaker import adaptive_timeout, circuit_breaker
+from .events import transition_detector
+from .history import HistoryStore
+from .persistence import ConfigStore, atomic_write, dump_config
+from .chat import ChatSettings
+from .transaction import UndoLog
+from .bulk import ENTRY_META_KEYS
+from .render import format_latency
+from .metrics import config_load_duration, probe_duration, probe_errors, probes_short_circuited, rollbacks
 from .exception import (
     ProtocolUnsopportError,
     NameConflictError,
     NameNotFoundError,
     ParamInvalidError,
+    ImportInvalidError,
 )
 
 PLUGIN_CONFIG_FILE_PATH = Path(store.get_data_file("nonebot-plugin-servicestate", "protocol_settings.json"))
+PROBE_HISTORY_FILE_PATH = Path(store.get_data_file("nonebot-plugin-servicestate", "probe_history.log"))
+CHAT_SETTINGS_FILE_PATH = Path(store.get_data_file("nonebot-plugin-servicestate", "chat_settings.json"))
+# 批量导入导出的文件所在目录，与插件自身的配置、日志及历史文件分开
+BULK_FILE_DIR_PATH = PLUGIN_CONFIG_FILE_PATH.parent / "exports"
+
+history_store = HistoryStore(PROBE_HISTORY_FILE_PATH)
+config_store = ConfigStore(PLUGIN_CONFIG_FILE_PATH)
+chat_settings = ChatSettings(CHAT_SETTINGS_FILE_PATH)
 
 
 def modify_exception_recovery(func):
-    def inner(*args, **kw):
+    @wraps(func)
+    def inner(self: CommandManager, *args, **kw):
         try:
-            manager.save()
-            return func(*args, **kw)
+            with self.transaction():
+                return func(self, *args, **kw)
         except Exception as e:
-            manager.load()
             logger.error(f"Modify railed: {e}")
             raise e
 
     return inner
 
 
+class NameIndex:
+    """
+    服务名称全局索引
+
+    记录每个服务名称所在的位置：独立服务为 None，群组成员为所属群组名称
+    """
+
+    def __init__(self) -> None:
+        self.__owners: Dict[str, Set[Optional[str]]] = {}
+        self.__undo_log: Optional[UndoLog] = None
+
+    def begin(self, undo_log: UndoLog) -> None:
+        self.__undo_log = undo_log
+
+    def end(self) -> None:
+        self.__undo_log = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__owners
+
+    def __len__(self) -> int:
+        return len(self.__owners)
+
+    def owners(self, name: str) -> Set[Optional[str]]:
+        return self.__owners.get(name, set())
+
+    def add(self, name: str, owner: Optional[str]) -> None:
+        owners = self.__owners.setdefault(name, set())
+        if owner in owners:
+            return
+        owners.add(owner)
+        if self.__undo_log is not None:
+            self.__undo_log.push(lambda: self.remove(name, owner))
+
+    def remove(self, name: str, owner: Optional[str]) -> None:
+        owners = self.__owners.get(name)
+        if owners is None or owner not in owners:
+            return
+        owners.discard(owner)
+        if not owners:
+            del self.__owners[name]
+        if self.__undo_log is not None:
+            self.__undo_log.push(lambda: self.add(name, owner))
+
+    def rebuild(self, service_status: ServiceStatus, service_status_group: ServiceStatusGroup) -> None:
+        self.__owners.clear()
+        for service in service_status:
+            self.add(service.name, None)
+        for group_name, group in service_status_group.items():
+            for service in group:
+                self.add(service.name, group_name)
+
+
 class CommandManager:
     __service_status: ServiceStatus = ServiceStatus()
     __service_status_group: ServiceStatusGroup = ServiceStatusGroup()
+    __result_cache: ResultCache = ResultCache()
+    __name_index: NameIndex = NameIndex()
+    __undo_log: Optional[UndoLog] = None
+    # 每次载入配置后加一，0 为尚未载入
+    __load_generation: int = 0
+    # 服务状态（正常或故障）或服务配置每次变化后加一，用于缓存渲染后的服务状态
+    __result_version: int = 0
+    # 显示的探测耗时每次变化后加一
+    __latency_changes: int = 0
+    # 服务配置每次变化后加一，后台调度器据此判断是否需要重新遍历服务
+    __config_version: int = 0
+    # 上次清理指标时的服务配置版本
+    __metrics_version: int = -1
+    rollback_count: int = 0
 
     def __init__(self) -> None:
         pass
 
+    @contextmanager
+    def transaction(self) -> Iterator[CommandManager]:
+        """
+        在事务中执行多项修改，出现异常时在内存中撤销本事务内的所有修改，嵌套时并入外层事务
+
+        事务不会保存配置，提交后按需调用 save
+        """
+        self.ensure_loaded()
+        if self.__undo_log is not None:
+            yield self
+            return
+        undo_log = UndoLog()
+        journal_mark = config_store.pending_count()
+        participants = (self.__service_status, self.__service_status_group, self.__name_index)
+        self.__undo_log = undo_log
+        for i in participants:
+            i.begin(undo_log)
+        try:
+            yield self
+        except BaseException:
+            for i in participants:
+                i.end()
+            logger.debug(f"Rolling back {len(undo_log)} changes")
+            undo_log.undo()
+            self.__result_version += 1
+            self.__config_version += 1
+            config_store.truncate_pending(journal_mark)
+            self.rollback_count += 1
+            rollbacks.inc()
+            raise
+        finally:
+            for i in participants:
+                i.end()
+            self.__undo_log = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__load_generation > 0
+
+    def ensure_loaded(self) -> None:
+        """
+        首次使用时载入配置，插件启动时会在线程池中提前载入
+        """
+        if not self.is_loaded:
+            self.load()
+
     def load(self, path: Path = PLUGIN_CONFIG_FILE_PATH) -> None:
-        with open(path, "r", encoding="utf-8") as f:
-            load_dict = json.loads(f.read())
-        self.__service_status = ServiceStatus.load(load_dict["service"])
-        self.__service_status_group = ServiceStatusGroup.load(load_dict["service_group"])
+        start_time = time.perf_counter()
+        # 先写入尚未保存的修改，否则载入的是修改前的配置，之后的保存会覆盖掉这些修改
+        config_store.flush_now()
+        self.__apply(*self.__read(path))
+        config_load_duration.observe(time.perf_counter() - start_time)
 
-    def save(self, path: Path = PLUGIN_CONFIG_FILE_PATH) -> None:
-        save_dict = {
-            "service": self.__service_status.export(),
-            "service_group": self.__service_status_group.export(),
+    async def load_async(self, path: Path = PLUGIN_CONFIG_FILE_PATH) -> None:
+        """
+        在线程池中读取并解析配置，在事件循环中替换当前配置，期间配置已被其他途径载入时放弃本次结果
+        """
+        start_time = time.perf_counter()
+        await config_store.flush()
+        generation = self.__load_generation
+        loaded = await get_event_loop().run_in_executor(None, self.__read, path)
+        if self.__load_generation != generation:
+            logger.debug("Config loaded by others while reading, discarded")
+            return
+        self.__apply(*loaded)
+        config_load_duration.observe(time.perf_counter() - start_time)
+
+    def __read(self, path: Path) -> Tuple[ServiceStatus, ServiceStatusGroup, List[Dict[str, Any]]]:
+        """
+        读取配置文件并创建服务，不修改当前配置，可在线程池中执行
+        """
+        if not path.is_file():
+            logger.info("Creating config file")
+            atomic_write(path, dump_config(self.__export(ServiceStatus(), ServiceStatusGroup())))
+        if path == config_store.path:
+            load_dict, records = config_store.load()
+        else:
+            load_dict, records = ConfigStore(path).load()
+        return ServiceStatus.load(load_dict["service"]), ServiceStatusGroup.load(load_dict["service_group"]), records
+
+    def __apply(
+        self, service_status: ServiceStatus, service_status_group: ServiceStatusGroup, records: List[Dict[str, Any]]
+    ) -> None:
+        self.__replace_config(service_status, service_status_group)
+        journal_mark = config_store.pending_count()
+        for record in records:
+            try:
+                self.__replay(record)
+            except Exception as e:
+                logger.warning(f"Ignored journal record {record}: {e}")
+        # 重放产生的记录已在日志中
+        config_store.truncate_pending(journal_mark)
+
+    def load_dict(self, load_dict: Dict[str, Any]) -> None:
+        self.__replace_config(
+            ServiceStatus.load(load_dict["service"]), ServiceStatusGroup.load(load_dict["service_group"])
+        )
+
+    def __replace_config(self, service_status: ServiceStatus, service_status_group: ServiceStatusGroup) -> None:
+        if self.__undo_log is not None:
+            raise RuntimeError("Config should not be loaded inside a transaction")
+        self.__service_status = service_status
+        self.__service_status_group = service_status_group
+        self.__name_index.rebuild(self.__service_status, self.__service_status_group)
+        self.__load_generation += 1
+        self.__result_version += 1
+        self.__config_version += 1
+
+    def export(self) -> Dict[str, Any]:
+        self.ensure_loaded()
+        return self.__export(self.__service_status, self.__service_status_group)
+
+    @staticmethod
+    def __export(service_status: ServiceStatus, service_status_group: ServiceStatusGroup) -> Dict[str, Any]:
+        return {
+            "service": service_status.export(),
+            "service_group": service_status_group.export(),
         }
-        if not path.parent.is_dir():
-            logger.debug("Creating plugin folder")
-            path.parent.mkdir(parents=True)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(
-                json.dumps(
-                    save_dict,
-                    ensure_ascii=False,
-                    sort_keys=True,
-                    indent=4,
-                )
-            )
+
+    @property
+    def result_version(self) -> int:
+        """
+        服务状态或服务配置的版本，版本不变时不显示耗时的服务状态无需重新渲染
+        """
+        return self.__result_version
+
+    @property
+    def latency_version(self) -> int:
+        """
+        包括显示的探测耗时在内的版本，版本不变时显示耗时的服务状态无需重新渲染
+        """
+        return self.__result_version + self.__latency_changes
+
+    @property
+    def config_version(self) -> int:
+        """
+        服务配置的版本，增删改服务及重新载入后变化
+        """
+        self.ensure_loaded()
+        return self.__config_version
+
+    def __journal(self, op: str, **kw) -> None:
+        # 所有修改都会记录变更，同时使渲染缓存失效
+        self.__result_version += 1
+        self.__config_version += 1
+        config_store.record(dict(op=op, **kw))
+
+    def __replay(self, record: Dict[str, Any]) -> None:
+        op = record["op"]
+        group_name = record.get("group")
+        if op == "bind":
+            instance = SupportProtocol.get_protocol(record["protocol"]).load(record["config"])
+            target = self.__service_status if group_name is None else self.__service_status_group[group_name]
+            target.bind_service(instance)
+            self.__name_index.add(instance.name, group_name)
+        elif op == "replace":
+            instance = SupportProtocol.get_protocol(record["protocol"]).load(record["config"])
+            target = self.__service_status if group_name is None else self.__service_status_group[group_name]
+            target[record["name"]] = instance
+            self.__rename_index(record["name"], instance.name, group_name)
+        elif op == "unbind":
+            self.unbind_service_by_name(record["name"] if group_name is None else [group_name, record["name"]])
+        elif op == "bind_group":
+            self.bind_group_by_name(record["members"], record["name"])
+        elif op == "unbind_group":
+            self.unbind_group_by_name(record["name"])
+        else:
+            raise ValueError(f"Unknown journal op {op}")
+
+    def is_top_level_name(self, name: str) -> bool:
+        """
+        名称是否已被独立服务或群组占用
+        """
+        self.ensure_loaded()
+        return None in self.__name_index.owners(name) or name in self.__service_status_group
+
+    def locate_service(self, name: str) -> Set[Optional[str]]:
+        """
+        查找服务名称所在的位置，独立服务为 None，群组成员为所属群组名称
+        """
+        self.ensure_loaded()
+        return set(self.__name_index.owners(name))
+
+    def save(self, path: Path = PLUGIN_CONFIG_FILE_PATH) -> None:
+        if path == config_store.path:
+            config_store.save(self.export)
+            return
+        atomic_write(path, dump_config(self.export()))
 
     def bind_new_service(self, protocol: str, name: Union[str, List[str]], host: str) -> None:
+        self.ensure_loaded()
         if protocol not in SupportProtocol.get():
             raise ProtocolUnsopportError
         if isinstance(name, List):
             return self.__bind_new_group_service(protocol, *name, host=host)
-        if name in self.__service_status:
+        if self.is_top_level_name(name):
             raise NameConflictError
-        if name in self.__service_status_group:
-            raise NameConflictError
-        self.__service_status.register_service(protocol, name=name, host=host)
+        instance = self.__service_status.register_service(protocol, name=name, host=host)
+        self.__name_index.add(name, None)
+        self.__journal("bind", group=None, protocol=protocol, config=instance.export())
 
     def __bind_new_group_service(self, protocol: str, group_name: str, service_name: str, host: str) -> None:
-        self.__service_status_group[group_name].register_service(protocol, name=service_name, host=host)
+        instance = self.__service_status_group[group_name].register_service(protocol, name=service_name, host=host)
+        self.__name_index.add(service_name, group_name)
+        self.__journal("bind", group=group_name, protocol=protocol, config=instance.export())
 
     def unbind_service_by_name(self, name: Union[str, List[str]]) -> None:
+        self.ensure_loaded()
         if isinstance(name, List):
             return self.__unbind_service_group_by_name(*name)
         if name in self.__service_status:
             self.__service_status.unbind_service(name)
+            self.__name_index.remove(name, None)
+            self.__journal("unbind", group=None, name=name)
             return
         if name in self.__service_status_group:
-            self.__service_status_group.unbind_group(name)
+            for i in self.__service_status_group.unbind_group(name):
+                self.__name_index.remove(i.name, name)
+            self.__journal("unbind", group=None, name=name)
             return
         raise NameNotFoundError
 
@@ -95,22 +359,33 @@ class CommandManager:
         if group_name not in self.__service_status_group:
             raise NameNotFoundError
         self.__service_status_group[group_name].unbind_service(name)
+        self.__name_index.remove(name, group_name)
+        self.__journal("unbind", group=group_name, name=name)
 
     def bind_group_by_name(self, service_name_list: List[str], name: str) -> None:
+        self.ensure_loaded()
         service_instance_list: List[BaseProtocol] = [self.__service_status[i] for i in service_name_list]
+        if name in self.__service_status_group or (name in self.__service_status and name not in service_name_list):
+            raise NameConflictError
         self.__service_status_group.bind_group(service_instance_list, name)
         for i in service_instance_list:
             self.__service_status.unbind_service(i)
+            self.__name_index.remove(i.name, None)
+            self.__name_index.add(i.name, name)
+        self.__journal("bind_group", name=name, members=list(service_name_list))
 
     @modify_exception_recovery
     def unbind_group_by_name(self, name: str) -> None:
         if name not in self.__service_status_group:
             raise NameNotFoundError
         for i in self.__service_status_group[name]:
-            if i.name in self.__service_status or i.name in self.__service_status_group:
+            if self.is_top_level_name(i.name):
                 raise NameConflictError
             self.__service_status.bind_service(i)
-        self.__service_status_group.unbind_group(name)
+        for i in self.__service_status_group.unbind_group(name):
+            self.__name_index.remove(i.name, name)
+            self.__name_index.add(i.name, None)
+        self.__journal("unbind_group", name=name)
 
     @modify_exception_recovery
     def modify_service_param(self, name: Union[str, List[str]], key: str, value: str) -> None:
@@ -121,7 +396,12 @@ class CommandManager:
         if key not in temp_config:
             raise ParamInvalidError
         temp_config[key] = value
-        self.__service_status[name] = protocol_instance.load(temp_config)
+        new_instance = protocol_instance.load(temp_config)
+        if new_instance.name != name and self.is_top_level_name(new_instance.name):
+            raise NameConflictError
+        self.__service_status[name] = new_instance
+        self.__rename_index(name, new_instance.name, None)
+        self.__journal("replace", group=None, name=name, protocol=new_instance._PROTOCOL_NAME, config=new_instance.export())
 
     @modify_exception_recovery
     def __modify_service_group_param(self, group_name: str, service_name, key: str, value: str):
@@ -132,15 +412,228 @@ class CommandManager:
         if key not in temp_config:
             raise ParamInvalidError
         temp_config[key] = value
-        self.__service_status_group[group_name][service_name] = original_instance.load(temp_config)
+        new_instance = original_instance.load(temp_config)
+        self.__service_status_group[group_name][service_name] = new_instance
+        self.__rename_index(service_name, new_instance.name, group_name)
+        self.__journal(
+            "replace", group=group_name, name=service_name, protocol=new_instance._PROTOCOL_NAME, config=new_instance.export()
+        )
+
+    def import_services(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        批量添加服务，entries 的格式见 bulk.parse_entries，群组不存在时新建群组，返回添加的服务数量
+
+        先一次校验全部服务，有任何错误时抛出 ImportInvalidError（args 为全部错误信息）且不做修改，
+        通过后在同一事务中添加，调用方只需保存一次
+        """
+        self.ensure_loaded()
+        services = self.__validate_import(entries)
+        groups: Dict[str, ServiceStatus] = {}
+        with self.transaction():
+            for group_name, instance in services:
+                if group_name is None:
+                    self.__service_status.bind_service(instance)
+                else:
+                    target = groups.get(group_name)
+                    if target is None:
+                        if group_name not in self.__service_status_group:
+                            self.__service_status_group.bind_group([], group_name)
+                            self.__journal("bind_group", name=group_name, members=[])
+                        target = groups[group_name] = self.__service_status_group[group_name]
+                    target.bind_service(instance)
+                self.__name_index.add(instance.name, group_name)
+                self.__journal("bind", group=group_name, protocol=instance._PROTOCOL_NAME, config=instance.export())
+        return len(services)
+
+    def __validate_import(self, entries: List[Dict[str, Any]]) -> List[Tuple[Optional[str], BaseProtocol]]:
+        errors: List[str] = []
+        services: List[Tuple[Optional[str], BaseProtocol]] = []
+        # 本次导入中各位置的服务名称，独立服务为 None，群组成员为群组名称
+        new_names: Dict[Optional[str], Set[str]] = {}
+        supported = set(SupportProtocol.get())
+        for index, entry in enumerate(entries, 1):
+            params = {i: j for i, j in entry.items() if i not in ENTRY_META_KEYS}
+            protocol = entry.get("protocol")
+            group_name = entry.get("group") or None
+            label = f"第 {index} 项" + (f"（{params['name']}）" if "name" in params else "")
+            if not isinstance(protocol, str) or protocol not in supported:
+                errors.append(f"{label}：不支持协议 {protocol}")
+                continue
+            if group_name is not None and not isinstance(group_name, str):
+                errors.append(f"{label}：群组名称应为字符串")
+                continue
+            if "name" not in params:
+                errors.append(f"{label}：缺少 name 参数")
+                continue
+            try:
+                protocol_class = SupportProtocol.get_protocol(protocol)
+            except KeyError:
+                errors.append(f"{label}：协议 {protocol} 导入失败")
+                continue
+            unknown = params.keys() - protocol_class._DATA_MODEL.__fields__.keys()
+            if unknown:
+                errors.append(f"{label}：{protocol} 协议没有参数 {'、'.join(sorted(unknown))}")
+                continue
+            try:
+                instance = protocol_class(**params)
+            except ValidationError as e:
+                invalid = sorted({str(i["loc"][0]) for i in e.errors() if i["loc"] and i["loc"][0] != "__root__"})
+                errors.append(f"{label}：" + (f"参数 {'、'.join(invalid)} 格式或类型不正确" if invalid else "参数组合不正确"))
+                continue
+            names = new_names.setdefault(group_name, set())
+            if instance.name in names:
+                errors.append(f"{label}：名称与本次导入的其他服务重复")
+                continue
+            names.add(instance.name)
+            services.append((group_name, instance))
+        # 与现有配置的名称冲突以集合运算一次找出，耗时只与导入数量相关
+        single_names = new_names.pop(None, set())
+        existing_single = self.__service_status.names()
+        existing_groups = self.__service_status_group.names()
+        for name in sorted((existing_single & single_names) | (existing_groups & single_names)):
+            errors.append(f"{name}：与现有服务或群组名称重复")
+        created_groups = new_names.keys() - existing_groups
+        for name in sorted(created_groups & single_names):
+            errors.append(f"{name}：与本次导入的群组名称重复")
+        for group_name in sorted(existing_single & created_groups):
+            errors.append(f"群组 {group_name}：与现有服务名称重复")
+        for group_name in sorted(existing_groups & new_names.keys()):
+            conflicts = self.__service_status_group[group_name].names() & new_names[group_name]
+            errors.extend(f"{group_name}@{name}：与群组中现有服务名称重复" for name in sorted(conflicts))
+        if errors:
+            raise ImportInvalidError(*errors)
+        return services
 
-    async def get_detect_result(self):
-        return dict(
-            (await self.__service_status.get_detect_result()),
-            **(await self.__service_status_group.get_detect_result()),
+    def export_entries(self) -> List[Dict[str, Any]]:
+        """
+        以批量导入的格式导出所有服务，独立服务的 group 为 None
+        """
+        return [
+            {"protocol": service._PROTOCOL_NAME, "group": key[0], **service.export()}
+            for key, service in self.iter_services()
+        ]
+
+    def __rename_index(self, old_name: str, new_name: str, owner: Optional[str]) -> None:
+        if old_name == new_name:
+            return
+        self.__name_index.remove(old_name, owner)
+        self.__name_index.add(new_name, owner)
+
+    def iter_services(self) -> Iterator[Tuple[ServiceKey, BaseProtocol]]:
+        self.ensure_loaded()
+        for service in self.__service_status:
+            yield (None, service.name), service
+        for group_name, service_status in self.__service_status_group.items():
+            for service in service_status:
+                yield (group_name, service.name), service
+
+    def prune_metrics(self) -> None:
+        """
+        移除已删除或改名服务的探测耗时指标，服务配置未变化时直接返回
+        """
+        if self.__metrics_version == self.config_version:
+            return
+        self.__metrics_version = self.config_version
+        labels = {(service._PROTOCOL_NAME, key[0] or "", key[1]) for key, service in self.iter_services()}
+        probe_duration.retain(labels.__contains__)
+
+    async def probe_service(self, key: ServiceKey, service: BaseProtocol, force: bool = False) -> ProbeResult:
+        """
+        探测服务并记录结果，force 为 True 时（刷新）忽略熔断，本次探测即为半开探测
+        """
+        if not force and circuit_breaker.is_open(key, service):
+            return self.__short_circuit(key, service)
+        # 调用方被取消（如群组中其他服务已故障）时探测仍会完成，结果照常记录
+        return await shield(ensure_future(self.__probe_and_record(key, service)))
+
+    async def __probe_and_record(self, key: ServiceKey, service: BaseProtocol) -> ProbeResult:
+        if adaptive_timeout.enabled:
+            service.set_timeout(
+                adaptive_timeout.compute(
+                    history_store.recent_latencies(key, adaptive_timeout.samples), service.configured_timeout
+                )
+            )
+        result = await probe_executor.run(service)
+        circuit_breaker.record(key, service, bool(result))
+        if result.latency is not None:
+            probe_duration.observe(result.latency, (service._PROTOCOL_NAME, key[0] or "", key[1]))
+        if not result:
+            probe_errors.inc((service._PROTOCOL_NAME, result.error or "unknown"))
+        previous = self.__result_cache.get(key, service)
+        self.__result_cache.set(key, service, result)
+        if previous is None or bool(previous.result) != bool(result):
+            self.__result_version += 1
+        elif format_latency(previous.result) != format_latency(result):
+            self.__latency_changes += 1
+        history_store.record(key, result)
+        transition_detector.observe(key, result)
+        return result
+
+    def __short_circuit(self, key: ServiceKey, service: BaseProtocol) -> ProbeResult:
+        """
+        熔断期间不发起探测，返回缓存中的故障结果
+        """
+        probes_short_circuited.inc((service._PROTOCOL_NAME,))
+        entry = self.__result_cache.get(key, service)
+        if entry is not None and not entry.result:
+            return entry.result
+        return ProbeResult(False, timestamp=time.time(), error="CircuitOpen")
+
+    def get_result_age(self, key: ServiceKey, service: BaseProtocol) -> Optional[float]:
+        entry = self.__result_cache.get(key, service)
+        return None if entry is None else entry.age
+
+    def get_oldest_result_age(self) -> Optional[float]:
+        ages = [self.get_result_age(key, service) for key, service in self.iter_services()]
+        ages = [i for i in ages if i is not None]
+        return max(ages) if ages else None
+
+    async def __detect(self, group_name: Optional[str], service: BaseProtocol, force: bool = False) -> ProbeResult:
+        key = (group_name, service.name)
+        if not force:
+            entry = self.__result_cache.get(key, service)
+            if entry is not None and entry.age < service.interval:
+                return entry.result
+        return await self.probe_service(key, service, force)
+
+    async def get_detect_result(self, force: bool = False) -> Dict[str, ProbeResult]:
+        self.ensure_loaded()
+        # 独立服务与所有群组的探测同时发起，群组结果在成员探测完成后合并为群组状态
+        single_result, group_result = await gather(
+            self.__service_status.get_detect_result(partial(self.__detect, None, force=force)),
+            self.__service_status_group.get_detect_result(partial(self.__detect, force=force)),
         )
+        return dict(single_result, **group_result)
+
+    def get_result_names(self) -> List[str]:
+        """
+        服务状态中显示的名称，顺序与 get_detect_result 相同
+        """
+        self.ensure_loaded()
+        return [i.name for i in self.__service_status] + [name for name, _ in self.__service_status_group.items()]
+
+    async def iter_detect_result(self, force: bool = False) -> AsyncIterator[Tuple[str, ProbeResult]]:
+        """
+        同时发起所有探测，按完成先后逐个返回 (名称, 结果)，提前结束迭代时取消尚未完成的探测
+        """
+        self.ensure_loaded()
+        tasks: Dict[Future, str] = {}
+        for service in self.__service_status:
+            tasks[ensure_future(self.__detect(None, service, force=force))] = service.name
+        for name, service_status in self.__service_status_group.items():
+            tasks[ensure_future(service_status.get_verdict(partial(self.__detect, name, force=force)))] = name
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    yield tasks[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
 
     def get_service_count(self) -> Tuple[int, int, int]:
+        self.ensure_loaded()
         single_count = len(self.__service_status)
         group_count = len(self.__service_status_group)
         group_service_count = 0
@@ -149,8 +642,5 @@ class CommandManager:
         return single_count, group_count, group_service_count
 
 
+# 配置在插件启动时于线程池中载入，此前使用时同步载入，见 CommandManager.ensure_loaded
 manager = CommandManager()
-if not PLUGIN_CONFIG_FILE_PATH.is_file():
-    logger.info("Creating config file")
-    manager.save()
-manager.load(PLUGIN_CONFIG_FILE_PATH)
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import math
+import time
+
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    指标基类
+
+    每组标签值对应一个数值，记录时只做一次字典查找，渲染时才拼接文本
+    """
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def format_labels(self, labels: LabelValues, extra: str = "") -> str:
+        pairs = [f'{k}="{escape_label_value(str(v))}"' for k, v in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def series(self) -> Dict[LabelValues, object]:
+        """
+        返回标签值到数值的字典，由子类实现
+        """
+        raise NotImplementedError
+
+    def retain(self, keep: Callable[[LabelValues], bool]) -> None:
+        """
+        只保留 keep 返回 True 的标签值对应的样本
+        """
+        series = self.series()
+        for labels in [i for i in series if not keep(i)]:
+            del series[labels]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.samples())
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.__values: Dict[LabelValues, float] = {}
+        if not self.labelnames:
+            self.__values[()] = 0
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self.__values.get(labels, 0)
+
+    def series(self) -> Dict[LabelValues, float]:
+        return self.__values
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in tuple(self.__values.items()):
+            yield f"{self.name}{self.format_labels(labels)} {format_value(value)}"
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.__values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.__values[labels] = self.__values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.__values[labels] = self.__values.get(labels, 0) - amount
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        self.__values[labels] = value
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self.__values.get(labels, 0)
+
+    def series(self) -> Dict[LabelValues, float]:
+        return self.__values
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in tuple(self.__values.items()):
+            yield f"{self.name}{self.format_labels(labels)} {format_value(value)}"
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        # 各区间内的计数，渲染时再累加为累计计数，最后一项为 +Inf
+        self.buckets = [0] * (size + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.__values: Dict[LabelValues, _HistogramValue] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        entry = self.__values.get(labels)
+        if entry is None:
+            entry = _HistogramValue(len(self.buckets))
+            self.__values[labels] = entry
+        entry.buckets[bisect_left(self.buckets, value)] += 1
+        entry.sum += value
+        entry.count += 1
+
+    def get(self, labels: LabelValues = ()) -> Tuple[int, float]:
+        """
+        返回 (次数, 总和)
+        """
+        entry = self.__values.get(labels)
+        return (0, 0.0) if entry is None else (entry.count, entry.sum)
+
+    def series(self) -> Dict[LabelValues, _HistogramValue]:
+        return self.__values
+
+    def samples(self) -> Iterable[str]:
+        for labels, entry in tuple(self.__values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry.buckets):
+                cumulative += count
+                le = 'le="' + format_value(bound) + '"'
+                yield f"{self.name}_bucket{self.format_labels(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{self.format_labels(labels)} {format_value(entry.sum)}"
+            yield f"{self.name}_count{self.format_labels(labels)} {entry.count}"
+
+
+class MetricsRegistry:
+    """
+    指标注册表，以 Prometheus 文本格式导出所有指标
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self.__metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.__metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def __iter__(self):
+        return iter(tuple(self.__metrics.values()))
+
+    def summary(self) -> str:
+        """
+        每个指标一行：名称与标签组合数
+        """
+        return "\n".join(f"{i.name} | {len(i.series())} 组" for i in self)
+
+    def render(self, keyword: str = "") -> str:
+        """
+        导出文本，指定关键字时只保留名称或标签中包含关键字的样本
+        """
+        if not keyword:
+            return "".join(i.render() for i in self)
+        lines: List[str] = []
+        for i in self:
+            lines.extend(line for line in i.samples() if keyword in line)
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def timed(histogram: Histogram, labels: LabelValues = ()):
+    """
+    记录协程函数耗时的装饰器，包括以异常结束的调用
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def inner(*args, **kw):
+            start_time = time.perf_counter()
+            try:
+                return await func(*args, **kw)
+            finally:
+                histogram.observe(time.perf_counter() - start_time, labels)
+
+        return inner
+
+    return decorator
+
+
+metrics = MetricsRegistry()
+
+probe_duration = metrics.histogram(
+    "servicestate_probe_duration_seconds",
+    "Duration of a single probe",
+    ("protocol", "group", "service"),
+)
+probe_queue_wait = metrics.histogram(
+    "servicestate_probe_queue_wait_seconds",
+    "Time a probe waited for a concurrency slot",
+    ("protocol",),
+)
+probe_errors = metrics.counter(
+    "servicestate_probe_errors_total",
+    "Failed probes by protocol and error",
+    ("protocol", "error"),
+)
+probes_coalesced = metrics.counter(
+    "servicestate_probes_coalesced_total",
+    "Probe requests served by an in-flight or recent probe of the same target",
+    ("protocol",),
+)
+probes_short_circuited = metrics.counter(
+    "servicestate_probes_short_circuited_total",
+    "Probe requests answered without probing because the circuit is open",
+    ("protocol",),
+)
+probes_in_flight = metrics.gauge(
+    "servicestate_probes_in_flight",
+    "Probes currently running",
+    ("protocol",),
+)
+handler_duration = metrics.histogram(
+    "servicestate_handler_duration_seconds",
+    "Duration of command handlers",
+    ("command",),
+)
+config_save_duration = metrics.histogram(
+    "servicestate_config_save_duration_seconds",
+    "Duration of config writes",
+    ("mode",),
+)
+config_load_duration = metrics.histogram(
+    "servicestate_config_load_duration_seconds",
+    "Duration of config loads",
+)
+rollbacks = metrics.counter(
+    "servicestate_rollbacks_total",
+    "Modifications rolled back after an error",
+)
+transitions = metrics.counter(
+    "servicestate_transitions_total",
+    "Service state transitions by kind",
+    ("kind",),
+)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import asyncio
+import json
+import os
+import time
+
+from nonebot.log import logger
+
+from .metrics import config_save_duration
+
+
+def dump_config(save_dict: Dict[str, Any]) -> str:
+    return json.dumps(
+        save_dict,
+        ensure_ascii=False,
+        sort_keys=True,
+        indent=4,
+    )
+
+
+def atomic_write(path: Path, content: str) -> None:
+    """
+    先写入同目录下的临时文件再替换，避免写入中途退出导致文件损坏
+    """
+    if not path.parent.is_dir():
+        logger.debug("Creating plugin folder")
+        path.parent.mkdir(parents=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class ConfigStore:
+    """
+    服务配置持久化
+
+    短时间内的多次保存请求合并为一次写入，文件读写在线程池中执行
+    开启日志模式后，每次保存只向 .journal 文件追加变更的服务记录，载入时在完整配置之上重放，日志记录过多时重写完整配置
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        debounce: float = 0.5,
+        journal: bool = False,
+        journal_max_records: int = 1000,
+    ) -> None:
+        self.path = path
+        self.journal_path = path.with_name(path.name + ".journal")
+        self.__debounce = debounce
+        self.__journal = journal
+        self.__journal_max_records = journal_max_records
+        self.__journal_count = 0
+        self.__pending_records: List[Dict[str, Any]] = []
+        self.__export_func: Optional[Callable[[], Dict[str, Any]]] = None
+        self.__timer: Optional[asyncio.TimerHandle] = None
+        self.__write_task: Optional[asyncio.Task] = None
+
+    def configure(self, debounce: float = 0.5, journal: bool = False, journal_max_records: int = 1000) -> None:
+        self.__debounce = debounce
+        self.__journal = journal
+        self.__journal_max_records = journal_max_records
+
+    @property
+    def journal_enabled(self) -> bool:
+        return self.__journal
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """
+        记录一条服务变更，仅在日志模式下生效
+        """
+        if self.__journal:
+            self.__pending_records.append(record)
+
+    def pending_count(self) -> int:
+        return len(self.__pending_records)
+
+    def truncate_pending(self, count: int) -> None:
+        """
+        丢弃第 count 条之后的待写入记录，用于事务回滚
+        """
+        del self.__pending_records[count:]
+
+    def load(self) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        读取完整配置及需要重放的日志记录
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            load_dict = json.loads(f.read())
+        records: List[Dict[str, Any]] = []
+        if self.journal_path.is_file():
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # 进程意外退出时最后一行可能不完整
+                        logger.warning("Ignored broken journal record")
+        # 尚未写入的记录不在此丢弃，由调用方在载入前 flush
+        self.__journal_count = len(records)
+        return load_dict, records
+
+    def save(self, export_func: Callable[[], Dict[str, Any]]) -> None:
+        """
+        申请保存，在事件循环中运行时合并短时间内的多次申请，否则立即写入
+        """
+        self.__export_func = export_func
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.__write(*self.__prepare())
+            return
+        if self.__timer is None:
+            self.__timer = loop.call_later(self.__debounce, self.__on_timer)
+
+    def __on_timer(self) -> None:
+        self.__timer = None
+        if self.__write_task is not None and not self.__write_task.done():
+            # 上一次写入尚未完成，顺延到下一个窗口
+            self.__timer = asyncio.get_event_loop().call_later(self.__debounce, self.__on_timer)
+            return
+        self.__write_task = asyncio.get_event_loop().create_task(self.__write_async())
+
+    async def __write_async(self) -> None:
+        try:
+            content, records = self.__prepare()
+            await asyncio.get_event_loop().run_in_executor(None, self.__write, content, records)
+        except Exception as e:
+            logger.error(f"Save config failed: {e}")
+
+    async def flush(self) -> None:
+        """
+        立即写入尚未保存的修改
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__write_task is not None and not self.__write_task.done():
+            await asyncio.gather(self.__write_task, return_exceptions=True)
+        if self.__export_func is not None or self.__pending_records:
+            await self.__write_async()
+
+    def flush_now(self) -> None:
+        """
+        在当前线程中立即写入尚未保存的修改，用于无法等待的同步载入
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__export_func is not None or self.__pending_records:
+            self.__write(*self.__prepare())
+
+    def __prepare(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        在事件循环中取出待写入的内容，返回 (完整配置, 日志记录)，完整配置为 None 时只追加日志
+        """
+        export_func, self.__export_func = self.__export_func, None
+        records, self.__pending_records = self.__pending_records, []
+        if (
+            self.__journal
+            and self.path.is_file()
+            and self.__journal_count + len(records) <= self.__journal_max_records
+        ):
+            self.__journal_count += len(records)
+            return None, records
+        self.__journal_count = 0
+        return export_func() if export_func is not None else None, []
+
+    def __write(self, save_dict: Optional[Dict[str, Any]], records: List[Dict[str, Any]]) -> None:
+        start_time = time.perf_counter()
+        if save_dict is not None:
+            atomic_write(self.path, dump_config(save_dict))
+            if self.journal_path.is_file():
+                self.journal_path.unlink()
+            config_save_duration.observe(time.perf_counter() - start_time, ("full",))
+            logger.debug(f"Saved config to {self.path}")
+            return
+        if not records:
+            return
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(i, ensure_ascii=False) + "\n" for i in records))
+            f.flush()
+            os.fsync(f.fileno())
+        config_save_duration.observe(time.perf_counter() - start_time, ("journal",))
+        logger.debug(f"Appended {len(records)} records to {self.journal_path}")
@@ -1,6 +1,17 @@
-from .protocol import BaseProtocol, BaseProtocolData, SupportProtocol
-from .http import HTTPProtocol
-from .tcp import TCPProtocol
+from typing import Any
+
+from .protocol import BaseProtocol, BaseProtocolData, SupportProtocol, ProbeResult
+from .dns import DNSCache, dns_cache
+
+# 内置协议在首次使用时才导入，见 SupportProtocol.LAZY_PROTOCOL
+_LAZY_EXPORTS = {"HTTPProtocol": "HTTP", "TCPProtocol": "TCP"}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_EXPORTS:
+        return SupportProtocol.get_protocol(_LAZY_EXPORTS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # 取消下方注释以启用demo协议
 # from .demo import DEMOProtocol
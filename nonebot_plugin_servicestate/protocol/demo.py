@@ -40,6 +40,7 @@ class DEMOProtocol(BaseProtocol):  # 类名可随意填写，但记得继承上
         """
         在此处实现你的自定义协议的处理代码
         最终返回bool（True为可用，False为故障）
+        如需附带更多信息，也可以返回 ProbeResult（可从 .protocol 导入）
         """
         if self.always_malfunction:
             # 自定义参数中always_malfunction参数为True，永远返回不可用状态
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
+import ipaddress
+import socket
+import time
+
+from nonebot.log import logger
+
+from ..exception import DNSResolveError
+
+# (family, type, proto, canonname, sockaddr)，与 getaddrinfo 的返回值相同
+AddressInfo = Tuple[int, int, int, str, Tuple[Any, ...]]
+
+
+class _DNSEntry(NamedTuple):
+    expires: float
+    addresses: Tuple[AddressInfo, ...]
+    error: Optional[str]
+
+
+class DNSCache:
+    """
+    异步 DNS 解析缓存
+
+    getaddrinfo 不提供记录的 TTL，成功与失败的解析结果分别按配置的时间缓存
+    超出容量时淘汰最久未使用的主机名，同一主机名的并发解析只发起一次
+    """
+
+    def __init__(self, ttl: float = 60.0, negative_ttl: float = 10.0, max_size: int = 1024) -> None:
+        self.__ttl = ttl
+        self.__negative_ttl = negative_ttl
+        self.__max_size = max_size
+        self.__entries: OrderedDict[Tuple[str, int], _DNSEntry] = OrderedDict()
+        self.__inflight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl: float = 60.0, negative_ttl: float = 10.0, max_size: int = 1024) -> None:
+        self.__ttl = ttl
+        self.__negative_ttl = negative_ttl
+        self.__max_size = max_size
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def clear(self) -> None:
+        self.__entries.clear()
+
+    @staticmethod
+    def parse_ip(host: str) -> Optional[int]:
+        """
+        host 为 IP 地址时返回地址族，否则返回 None
+        """
+        try:
+            ip = ipaddress.ip_address(host.strip("[]"))
+        except ValueError:
+            return None
+        return socket.AF_INET6 if ip.version == 6 else socket.AF_INET
+
+    async def resolve(self, host: str, port: int = 0, family: int = 0) -> List[AddressInfo]:
+        """
+        解析主机名，返回带有指定端口的地址列表，解析失败时抛出 DNSResolveError
+        """
+        ip_family = self.parse_ip(host)
+        if ip_family is not None:
+            address = host.strip("[]")
+            sockaddr = (address, port, 0, 0) if ip_family == socket.AF_INET6 else (address, port)
+            return [(ip_family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", sockaddr)]
+        key = (host.lower(), family)
+        entry = self.__entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self.__entries.move_to_end(key)
+            self.hits += 1
+        else:
+            entry = await asyncio.shield(self.__get_lookup(key))
+        if entry.error is not None:
+            raise DNSResolveError(f"{host}: {entry.error}")
+        return [(f, t, p, c, (sockaddr[0], port) + tuple(sockaddr[2:])) for f, t, p, c, sockaddr in entry.addresses]
+
+    def __get_lookup(self, key: Tuple[str, int]) -> asyncio.Future:
+        future = self.__inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self.__lookup(*key))
+            self.__inflight[key] = future
+            future.add_done_callback(lambda _: self.__inflight.pop(key, None))
+        return future
+
+    async def __lookup(self, host: str, family: int) -> _DNSEntry:
+        loop = asyncio.get_event_loop()
+        try:
+            addresses = await loop.getaddrinfo(host, 0, family=family, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.debug(f"DNS -> {host} FAIL: {e}")
+            entry = _DNSEntry(time.monotonic() + self.__negative_ttl, (), type(e).__name__)
+        else:
+            if addresses:
+                entry = _DNSEntry(time.monotonic() + self.__ttl, tuple(addresses), None)
+            else:
+                entry = _DNSEntry(time.monotonic() + self.__negative_ttl, (), "no address")
+        self.__entries[(host, family)] = entry
+        self.__entries.move_to_end((host, family))
+        while len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+        return entry
+
+
+dns_cache = DNSCache()
@@ -1,38 +1,366 @@
 from __future__ import annotations
 
-from httpx import AsyncClient
-from typing import Union, Dict, List, Any
+from httpx import URL, AsyncBaseTransport, AsyncByteStream, AsyncClient, Limits, Request, Response, create_ssl_context
+from pydantic import root_validator, validator
+from typing import Union, Dict, List, Any, AsyncIterator, Iterable, Tuple, Optional
+from functools import lru_cache
+from urllib.request import getproxies
+import importlib.util
+import asyncio
+import time
 
-from .protocol import BaseProtocol, BaseProtocolData
+import httpcore
+
+from .protocol import BaseProtocol, BaseProtocolData, ProbeResult
+from .dns import dns_cache
 
 from nonebot.log import logger
 
+# HTTP/2 需要可选依赖 h2（pip install httpx[http2]），未安装时回退到 HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# 自定义网络后端需要较新的 httpcore，较早的版本不经过 DNS 缓存
+NETWORK_BACKEND_AVAILABLE = hasattr(httpcore, "AsyncNetworkBackend") and hasattr(httpcore, "AnyIOBackend")
+
+
+if NETWORK_BACKEND_AVAILABLE:
+
+    class CachedDNSBackend(httpcore.AsyncNetworkBackend):
+        """
+        通过 DNS 缓存解析主机名的网络后端
+
+        只在建立 TCP 连接时替换地址，请求地址、Host 与 TLS SNI 仍为原主机名，连接池也按主机名复用连接
+        依次尝试解析得到的每个地址，全部连接失败时抛出最后一个错误
+        """
+
+        def __init__(self) -> None:
+            self.__backend = httpcore.AnyIOBackend()
+
+        async def connect_tcp(
+            self,
+            host: str,
+            port: int,
+            timeout: Optional[float] = None,
+            local_address: Optional[str] = None,
+            socket_options: Optional[Iterable[Any]] = None,
+        ) -> httpcore.AsyncNetworkStream:
+            address_list = await asyncio.wait_for(dns_cache.resolve(host, port), timeout)
+            error: Optional[Exception] = None
+            for address in address_list:
+                try:
+                    return await self.__backend.connect_tcp(
+                        address[4][0], port, timeout, local_address=local_address, socket_options=socket_options
+                    )
+                except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                    logger.debug(f"Connect -> {host} ({address[4][0]}) FAIL: {e}")
+                    error = e
+            raise error
+
+        async def connect_unix_socket(
+            self, path: str, timeout: Optional[float] = None, socket_options: Optional[Iterable[Any]] = None
+        ) -> httpcore.AsyncNetworkStream:
+            return await self.__backend.connect_unix_socket(path, timeout, socket_options=socket_options)
+
+        async def sleep(self, seconds: float) -> None:
+            await self.__backend.sleep(seconds)
+
+    class _ResponseStream(AsyncByteStream):
+        def __init__(self, stream: Any) -> None:
+            self.__stream = stream
+
+        async def __aiter__(self) -> AsyncIterator[bytes]:
+            async for chunk in self.__stream:
+                yield chunk
+
+        async def aclose(self) -> None:
+            if hasattr(self.__stream, "aclose"):
+                await self.__stream.aclose()
+
+    class CachedDNSTransport(AsyncBaseTransport):
+        """
+        使用 CachedDNSBackend 建立连接的传输层，请求与响应的转换与 httpx 默认的传输层相同
+        httpcore 的异常不转换为 httpx 的异常，两者同名，不影响以异常名称记录的失败原因
+        """
+
+        def __init__(self, verify: bool, http2: bool, limits: Limits) -> None:
+            self.__pool = httpcore.AsyncConnectionPool(
+                ssl_context=create_ssl_context(verify=verify),
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=limits.keepalive_expiry,
+                http1=True,
+                http2=http2,
+                network_backend=CachedDNSBackend(),
+            )
+
+        async def handle_async_request(self, request: Request) -> Response:
+            response = await self.__pool.handle_async_request(
+                httpcore.Request(
+                    method=request.method,
+                    url=httpcore.URL(
+                        scheme=request.url.raw_scheme,
+                        host=request.url.raw_host,
+                        port=request.url.port,
+                        target=request.url.raw_path,
+                    ),
+                    headers=request.headers.raw,
+                    content=request.stream,
+                    extensions=request.extensions,
+                )
+            )
+            return Response(
+                status_code=response.status,
+                headers=response.headers,
+                stream=_ResponseStream(response.stream),
+                extensions=response.extensions,
+            )
+
+        async def aclose(self) -> None:
+            await self.__pool.aclose()
+
+
+class HTTPClientPool:
+    """
+    HTTP 客户端复用池
+
+    按 (proxies, verify, max_redirects, http2) 复用 AsyncClient，使探测之间可以保持长连接，超时时间随每次请求传入
+    未指定代理且环境变量中没有代理时通过 CachedDNSTransport 建立连接，不再每次解析主机名，
+    有代理时使用 httpx 默认的传输层，由代理解析主机名
+    HTTP/2 客户端对同一源的请求复用同一连接，并发流数量按源限制为 http2_max_streams
+    """
+
+    def __init__(self) -> None:
+        self.__clients: Dict[Tuple[Any, ...], AsyncClient] = {}
+        self.__limits = Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+        self.__http2_max_streams = 100
+        self.__stream_slots: Dict[Tuple[Any, ...], asyncio.Semaphore] = {}
+        self.__http2_warned = False
+
+    def configure(
+        self,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 30.0,
+        http2_max_streams: int = 100,
+    ) -> None:
+        """
+        修改连接池限制，仅对之后新建的客户端生效
+        """
+        self.__limits = Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.__http2_max_streams = http2_max_streams
+        self.__stream_slots.clear()
+
+    def get(
+        self, proxies: Union[str, None], verify: bool, max_redirects: int = 20, http2: bool = False
+    ) -> AsyncClient:
+        if http2 and not HTTP2_AVAILABLE:
+            if not self.__http2_warned:
+                logger.warning("HTTP/2 requires h2, install it with `pip install httpx[http2]`. Using HTTP/1.1 instead")
+                self.__http2_warned = True
+            http2 = False
+        key = (proxies, verify, max_redirects, http2)
+        client = self.__clients.get(key)
+        if client is None or client.is_closed:
+            logger.debug(f"Creating HTTP client for {key}")
+            client = AsyncClient(
+                proxies=proxies,
+                verify=verify,
+                http2=http2,
+                follow_redirects=max_redirects > 0,
+                max_redirects=max_redirects,
+                limits=self.__limits,
+                transport=self.__create_transport(proxies, verify, http2),
+            )
+            self.__clients[key] = client
+        return client
+
+    def __create_transport(
+        self, proxies: Union[str, None], verify: bool, http2: bool
+    ) -> Optional[AsyncBaseTransport]:
+        # 指定 transport 后 httpx 不再读取环境变量中的代理，有代理时不替换传输层
+        if not NETWORK_BACKEND_AVAILABLE or proxies is not None:
+            return None
+        if any(i in getproxies() for i in ("http", "https", "all")):
+            return None
+        return CachedDNSTransport(verify, http2, self.__limits)
+
+    def stream_slot(self, url: URL) -> asyncio.Semaphore:
+        """
+        获取 url 所在源的 HTTP/2 并发流限制
+        """
+        origin = (url.scheme, url.host, url.port)
+        semaphore = self.__stream_slots.get(origin)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.__http2_max_streams)
+            self.__stream_slots[origin] = semaphore
+        return semaphore
+
+    def __len__(self) -> int:
+        return len(self.__clients)
+
+    async def aclose(self) -> None:
+        clients = list(self.__clients.values())
+        self.__clients.clear()
+        self.__stream_slots.clear()
+        for client in clients:
+            await client.aclose()
+
+
+client_pool = HTTPClientPool()
+
+
+@lru_cache(maxsize=256)
+def parse_status_codes(spec: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    解析有效响应码，如 "200,204,300-399"，返回闭区间列表，格式错误时抛出 ValueError
+    """
+    ranges: List[Tuple[int, int]] = []
+    for item in spec.replace(" ", "").split(","):
+        if not item:
+            continue
+        low, _, high = item.partition("-")
+        low_code = int(low)
+        high_code = int(high) if high else low_code
+        if not 100 <= low_code <= high_code <= 599:
+            raise ValueError(f"Invalid status code range: {item}")
+        ranges.append((low_code, high_code))
+    if not ranges:
+        raise ValueError("Empty status code set")
+    return tuple(ranges)
+
 
 class HTTPProtocolData(BaseProtocolData):
     proxies: Union[str, None] = None
+    # GET 或 HEAD
+    method: str = "GET"
+    # 收到响应头后即结束请求，不读取响应体，连接不再复用
+    stream: bool = False
+    # 最大重定向次数，0 为不跟随重定向
+    max_redirects: int = 20
+    # 有效响应码，以逗号分隔，支持 300-399 形式的范围
+    expected_status: str = "200"
+    # 响应体需包含的内容，仅读取前 keyword_max_bytes 字节，None 为不检查
+    keyword: Union[str, None] = None
+    keyword_max_bytes: int = 65536
+    # 通过 ALPN 协商使用 HTTP/2，同一源的探测复用一个连接，仅对 https 地址生效，服务器不支持时使用 HTTP/1.1
+    http2: bool = False
+
+    @validator("method")
+    def check_method(cls, value: str) -> str:
+        value = value.upper()
+        if value not in ("GET", "HEAD"):
+            raise ValueError("method should be GET or HEAD")
+        return value
+
+    @validator("max_redirects")
+    def check_max_redirects(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("max_redirects should not be negative")
+        return value
+
+    @validator("keyword_max_bytes")
+    def check_keyword_max_bytes(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("keyword_max_bytes should be positive")
+        return value
+
+    @validator("expected_status")
+    def check_expected_status(cls, value: str) -> str:
+        parse_status_codes(value)
+        return value
+
+    @root_validator(skip_on_failure=True)
+    def check_keyword(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        if values.get("keyword") is not None and values.get("method") == "HEAD":
+            raise ValueError("keyword check requires GET")
+        return values
 
 
 class HTTPProtocol(BaseProtocol):
     _PROTOCOL_NAME = "HTTP"
     _DATA_MODEL = HTTPProtocolData
 
-    async def detect(self) -> bool:
-        async with AsyncClient(
-            proxies=self.proxies,
-            verify=False,
-            follow_redirects=True,
-            timeout=self.timeout,
-        ) as client:
-            try:
-                respond = await client.get(url=self.host)
-            except:
-                logger.debug(f"GET -> {self.host} FAIL")
-                return False
-            if not respond:
-                logger.debug(f"GET -> {self.host} FAIL")
-                return False
-            if respond.status_code != 200:
-                logger.debug(f"GET -> {self.host} FAIL")
-                return False
-            logger.debug(f"GET -> {self.host} OK")
-            return True
+    @property
+    def multiplexed(self) -> bool:
+        # 只有 https 地址能通过 ALPN 协商 HTTP/2，并发流数量由 client_pool.stream_slot 限制
+        return self.http2 and HTTP2_AVAILABLE and self.host.lower().startswith("https://")
+
+    async def detect(self) -> ProbeResult:
+        client = client_pool.get(self.proxies, False, self.max_redirects, self.http2)
+        try:
+            headers: Dict[str, str] = {}
+            if self.keyword is not None:
+                # 只需要响应体的开头部分，服务器支持时以 206 返回
+                headers["Range"] = f"bytes=0-{self.keyword_max_bytes - 1}"
+            request = client.build_request(self.method, self.host, headers=headers, timeout=self.timeout)
+        except Exception as e:
+            logger.debug(f"{self.method} -> {self.host} FAIL")
+            return ProbeResult(False, error=type(e).__name__)
+        if self.http2:
+            async with client_pool.stream_slot(request.url):
+                return await self.__exchange(client, request)
+        return await self.__exchange(client, request)
+
+    async def __exchange(self, client: AsyncClient, request: Request) -> ProbeResult:
+        """
+        发送请求并检查响应，stream_latency 为从发送到收到响应头的耗时，不含等待并发流限制的时间
+        """
+        start_time = time.perf_counter()
+        try:
+            respond = await client.send(request, stream=True)
+        except Exception as e:
+            logger.debug(f"{self.method} -> {self.host} FAIL")
+            return ProbeResult(False, error=type(e).__name__)
+        stream_latency = time.perf_counter() - start_time
+        try:
+            result = await self.__check(respond)
+        except Exception as e:
+            logger.debug(f"{self.method} -> {self.host} FAIL")
+            result = ProbeResult(False, error=type(e).__name__, detail={"status_code": respond.status_code})
+        finally:
+            await respond.aclose()
+        result.detail.update(http_version=respond.http_version, stream_latency=stream_latency)
+        return result
+
+    async def __check(self, respond: Response) -> ProbeResult:
+        status_code = respond.status_code
+        detail = {"status_code": status_code}
+        if status_code == 206 and self.keyword is not None:
+            # 206 是对本次 Range 请求的正常响应
+            status_code = 200
+        if not any(low <= status_code <= high for low, high in parse_status_codes(self.expected_status)):
+            logger.debug(f"{self.method} -> {self.host} FAIL")
+            return ProbeResult(False, error=f"HTTP {respond.status_code}", detail=detail)
+        if self.keyword is not None:
+            if not await self.__search_body(respond):
+                logger.debug(f"{self.method} -> {self.host} FAIL")
+                return ProbeResult(False, error="KeywordNotFound", detail=detail)
+        elif not self.stream:
+            # 逐块读取并丢弃响应体（HEAD 为空），读完后连接才会归还连接池复用
+            async for _ in respond.aiter_raw():
+                pass
+        logger.debug(f"{self.method} -> {self.host} OK")
+        return ProbeResult(True, detail=detail)
+
+    async def __search_body(self, respond: Response) -> bool:
+        """
+        在响应体的前 keyword_max_bytes 字节中查找 keyword，响应体不超过该长度时读完以复用连接
+        """
+        keyword = self.keyword.encode("utf-8")
+        limit = self.keyword_max_bytes
+        body = bytearray()
+        found = False
+        received = 0
+        async for chunk in respond.aiter_bytes():
+            received += len(chunk)
+            if not found:
+                # 只在新读取的部分及与之前内容的交界处查找
+                start = max(len(body) - len(keyword) + 1, 0)
+                body += chunk[: limit - len(body)]
+                found = body.find(keyword, start) != -1
+            if received > limit:
+                break
+        return found
@@ -1,30 +1,160 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Union, Dict, List, Type, Any
-from pydantic import BaseModel
+from typing import Union, Dict, List, Type, Any, Optional, Callable
+from pydantic import BaseModel, ValidationError
+from importlib.metadata import EntryPoint, entry_points
+import importlib
+import time
+
+from nonebot.log import logger
+
+# 第三方协议包通过该入口点组登记协议，入口点名称为协议名称，值为协议类或定义协议类的模块
+ENTRY_POINT_GROUP = "nonebot_plugin_servicestate.protocols"
+
+
+def select_entry_points(group: str) -> List[EntryPoint]:
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        return list(eps.select(group=group))
+    # Python 3.8、3.9 返回以组名为键的字典
+    return list(eps.get(group, []))
 
 
 class SupportProtocol:
     SUPPORT_PROTOCOL: Dict[str, Type[BaseProtocol]] = {}
+    # 内置协议所在的模块，首次使用该协议时才导入，避免启动时导入 httpx 等依赖
+    LAZY_PROTOCOL: Dict[str, str] = {"HTTP": ".http", "TCP": ".tcp"}
+    # 通过入口点发现的第三方协议，首次获取协议名称时扫描，首次使用该协议时才导入
+    ENTRY_POINT_PROTOCOL: Optional[Dict[str, EntryPoint]] = None
+    # 协议导入后需要执行的回调，如按插件配置设置连接池
+    IMPORT_HOOKS: Dict[str, List[Callable[[Type[BaseProtocol]], None]]] = {}
 
     @staticmethod
-    def register() -> None:
-        for this_subclass in BaseProtocol.__subclasses__():
-            if this_subclass._PROTOCOL_NAME is None:
-                raise ValueError('Protocol should have "_PROTOCOL_NAME"')
-            if this_subclass._PROTOCOL_NAME in SupportProtocol.SUPPORT_PROTOCOL.keys():
-                continue
-            SupportProtocol.SUPPORT_PROTOCOL[this_subclass._PROTOCOL_NAME] = this_subclass
+    def register(protocol: Type[BaseProtocol]) -> None:
+        """
+        登记协议类，由 BaseProtocol.__init_subclass__ 在定义子类时调用，同名协议以先登记的为准
+        """
+        if protocol._PROTOCOL_NAME is None:
+            raise ValueError('Protocol should have "_PROTOCOL_NAME"')
+        SupportProtocol.SUPPORT_PROTOCOL.setdefault(protocol._PROTOCOL_NAME, protocol)
+
+    @staticmethod
+    def discover() -> Dict[str, EntryPoint]:
+        """
+        扫描已安装的第三方协议入口点，只扫描一次，不导入协议模块
+        """
+        if SupportProtocol.ENTRY_POINT_PROTOCOL is None:
+            found: Dict[str, EntryPoint] = {}
+            try:
+                eps = select_entry_points(ENTRY_POINT_GROUP)
+            except Exception as e:
+                logger.error(f"Discover protocol entry points failed: {e}")
+                eps = []
+            for entry_point in eps:
+                if entry_point.name in SupportProtocol.LAZY_PROTOCOL or entry_point.name in found:
+                    logger.warning(f"Protocol {entry_point.name} from {entry_point.value} ignored, name already in use")
+                    continue
+                found[entry_point.name] = entry_point
+            SupportProtocol.ENTRY_POINT_PROTOCOL = found
+        return SupportProtocol.ENTRY_POINT_PROTOCOL
 
     @staticmethod
     def get() -> List[str]:
-        return list(SupportProtocol.SUPPORT_PROTOCOL.keys())
+        """
+        所有支持的协议名称，不会导入尚未使用的协议
+        """
+        return list(
+            dict.fromkeys(
+                [*SupportProtocol.LAZY_PROTOCOL, *SupportProtocol.discover(), *SupportProtocol.SUPPORT_PROTOCOL]
+            )
+        )
+
+    @staticmethod
+    def get_protocol(name: str) -> Type[BaseProtocol]:
+        """
+        按名称获取协议，必要时导入协议所在的模块，不支持或导入失败的协议抛出 KeyError
+        """
+        protocol = SupportProtocol.SUPPORT_PROTOCOL.get(name)
+        if protocol is None:
+            if name in SupportProtocol.LAZY_PROTOCOL:
+                importlib.import_module(SupportProtocol.LAZY_PROTOCOL[name], __package__)
+            else:
+                SupportProtocol.__load_entry_point(name)
+            protocol = SupportProtocol.SUPPORT_PROTOCOL.get(name)
+            if protocol is None:
+                logger.error(f"Protocol {name} is not defined by its module")
+                raise KeyError(name)
+        hooks = SupportProtocol.IMPORT_HOOKS.pop(name, None)
+        if hooks:
+            for hook in hooks:
+                hook(protocol)
+        return protocol
+
+    @staticmethod
+    def __load_entry_point(name: str) -> None:
+        entry_point = SupportProtocol.discover().get(name)
+        if entry_point is None:
+            raise KeyError(name)
+        try:
+            # 导入时协议类通过 __init_subclass__ 完成登记
+            entry_point.load()
+        except Exception as e:
+            logger.error(f"Load protocol {name} from {entry_point.value} failed: {e}")
+            raise KeyError(name) from e
+
+    @staticmethod
+    def on_import(name: str, hook: Callable[[Type[BaseProtocol]], None]) -> None:
+        """
+        协议首次通过 get_protocol 获取时执行 hook，协议已导入时立即执行
+        """
+        if name in SupportProtocol.SUPPORT_PROTOCOL:
+            hook(SupportProtocol.SUPPORT_PROTOCOL[name])
+            return
+        SupportProtocol.IMPORT_HOOKS.setdefault(name, []).append(hook)
+
+
+class ProbeResult:
+    """
+    单次探测结果
+
+    status：是否可用
+    latency：探测耗时（秒）
+    timestamp：探测开始时间
+    error：失败时的异常类名或失败原因
+    detail：协议相关的附加信息，如 HTTP 状态码、TCP 连接耗时
+    """
+
+    __slots__ = ("status", "latency", "timestamp", "error", "detail")
+
+    def __init__(
+        self,
+        status: bool,
+        latency: Optional[float] = None,
+        timestamp: Optional[float] = None,
+        error: Optional[str] = None,
+        detail: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.status = status
+        self.latency = latency
+        self.timestamp = timestamp
+        self.error = error
+        self.detail = detail
+
+    def __bool__(self) -> bool:
+        return self.status
+
+    def __repr__(self) -> str:
+        return (
+            f"ProbeResult(status={self.status}, latency={self.latency}, "
+            f"timestamp={self.timestamp}, error={self.error}, detail={self.detail})"
+        )
 
 
 class BaseProtocolData(BaseModel):
     name: str = "Unknown"
     host: str = "127.0.0.1"
-    timeout: int = 2
+    timeout: float = 2
+    interval: int = 60
 
 
 class BaseProtocol(ABC):
@@ -32,10 +162,59 @@ class BaseProtocol(ABC):
     _DATA_MODEL = BaseProtocolData
 
     def __init__(self, *args, **kw) -> None:
-        self.__data = self._DATA_MODEL(*args, **kw)
+        self.__data: Optional[BaseProtocolData] = self._DATA_MODEL(*args, **kw)
+        self.__source: Optional[Dict[str, Any]] = None
+        self.__timeout: Optional[float] = None
+
+    @property
+    def __model(self) -> BaseProtocolData:
+        if self.__data is None:
+            source, self.__source = self.__source, None
+            try:
+                self.__data = self._DATA_MODEL(**source)
+            except ValidationError as e:
+                # 配置文件被手动修改为无效值时，无效的参数使用默认值，不影响其余服务
+                invalid = {i["loc"][0] for i in e.errors() if i["loc"]}
+                logger.error(f"Invalid config of {source.get('name')}: {', '.join(map(str, invalid))}, using defaults")
+                valid = {i: j for i, j in source.items() if i not in invalid or i == "name"}
+                try:
+                    self.__data = self._DATA_MODEL(**valid)
+                except ValidationError:
+                    self.__data = self._DATA_MODEL(name=str(source.get("name", "Unknown")))
+        return self.__data
+
+    @property
+    def name(self) -> str:
+        if self.__data is None:
+            return str(self.__source.get("name", self._DATA_MODEL.__fields__["name"].default))
+        return self.__data.name
+
+    @property
+    def timeout(self) -> float:
+        """
+        本次探测实际使用的超时时间，未设置自适应超时时为配置值
+        """
+        return self.__model.timeout if self.__timeout is None else self.__timeout
+
+    @property
+    def configured_timeout(self) -> float:
+        return self.__model.timeout
+
+    def set_timeout(self, timeout: Optional[float]) -> None:
+        """
+        设置自适应超时，None 为恢复使用配置值
+        """
+        self.__timeout = timeout
+
+    @property
+    def multiplexed(self) -> bool:
+        """
+        对同一主机的探测是否在一个连接上并发进行，为 True 时不受 max_per_host 限制，由协议自行限制并发数量
+        """
+        return False
 
     def __init_subclass__(cls) -> None:
-        SupportProtocol.register()
+        SupportProtocol.register(cls)
         return super().__init_subclass__()
 
     def __eq__(self, __o: Union[str, BaseProtocol]) -> bool:
@@ -52,15 +231,48 @@ class BaseProtocol(ABC):
         return True
 
     def __getattr__(self, __name: str) -> Any:
-        return getattr(self.__data, __name)
+        return getattr(self.__model, __name)
 
     @abstractmethod
-    async def detect(self) -> bool:
+    async def detect(self) -> Union[bool, ProbeResult]:
         return False
 
+    async def probe(self) -> ProbeResult:
+        """
+        执行 detect 并统一包装为 ProbeResult，兼容只返回 bool 的协议
+        """
+        timestamp = time.time()
+        start_time = time.perf_counter()
+        try:
+            result = await self.detect()
+        except Exception as e:
+            return ProbeResult(False, time.perf_counter() - start_time, timestamp, error=type(e).__name__)
+        latency = time.perf_counter() - start_time
+        if not isinstance(result, ProbeResult):
+            return ProbeResult(bool(result), latency, timestamp)
+        if result.latency is None:
+            result.latency = latency
+        if result.timestamp is None:
+            result.timestamp = timestamp
+        return result
+
     def export(self) -> Dict:
+        if self.__data is None:
+            # 尚未使用的服务直接导出原始配置，缺少的参数使用默认值
+            return {i: self.__source.get(i, j.get_default()) for i, j in self._DATA_MODEL.__fields__.items()}
         return self.__data.dict()
 
     @classmethod
     def load(cls, source: Dict[str, Union[str, int, None]]) -> BaseProtocol:
         return cls(**source)
+
+    @classmethod
+    def load_lazy(cls, source: Dict[str, Any]) -> BaseProtocol:
+        """
+        从配置文件载入，首次访问服务参数时才创建并校验数据模型
+        """
+        instance = cls.__new__(cls)
+        instance.__data = None
+        instance.__source = dict(source)
+        instance.__timeout = None
+        return instance
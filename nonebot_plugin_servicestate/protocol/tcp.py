@@ -1,27 +1,64 @@
 from __future__ import annotations
 
-from typing import Union, Dict
+from typing import Any, Union, Dict, Tuple
 
-from .protocol import BaseProtocol, BaseProtocolData
+from .protocol import BaseProtocol, BaseProtocolData, ProbeResult
+from .dns import dns_cache
 
 from nonebot.log import logger
 import asyncio
+import socket
+import time
 
 
 class TCPProtocolData(BaseProtocolData):
     port: int = 80
+    # 仅检查能否建立连接，使用非阻塞 socket 直接连接，不创建 StreamReader / StreamWriter
+    half_open: bool = False
 
 
 class TCPProtocol(BaseProtocol):
     _PROTOCOL_NAME = "TCP"
     _DATA_MODEL = TCPProtocolData
 
-    async def detect(self) -> bool:
-        connect_func = asyncio.open_connection(self.host, self.port)
+    async def detect(self) -> ProbeResult:
+        start_time = time.perf_counter()
         try:
-            await asyncio.wait_for(connect_func, self.timeout)
-            logger.debug(f"TCP -> {self.host}:{self.port} OK")
-            return True
-        except:
+            await asyncio.wait_for(self.__connect(), self.timeout)
+        except Exception as e:
             logger.debug(f"TCP -> {self.host}:{self.port} FAIL")
-            return False
+            return ProbeResult(False, error=type(e).__name__)
+        logger.debug(f"TCP -> {self.host}:{self.port} OK")
+        return ProbeResult(True, detail={"connect_time": time.perf_counter() - start_time})
+
+    async def __connect(self) -> None:
+        # 解析失败抛出 DNSResolveError，与连接失败区分
+        address_list = await dns_cache.resolve(self.host, self.port)
+        connect_func = self.__socket_connect if self.half_open else self.__stream_connect
+        last_exception: Union[OSError, None] = None
+        for family, type_, proto, _, address in address_list:
+            try:
+                await connect_func(family, type_, proto, address)
+                return
+            except OSError as e:
+                last_exception = e
+        raise last_exception
+
+    @staticmethod
+    async def __stream_connect(family: int, type_: int, proto: int, address: Tuple[Any, ...]) -> None:
+        _, writer = await asyncio.open_connection(address[0], address[1], family=family, proto=proto)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            # 连接已建立，关闭时对端重置不影响探测结果
+            pass
+
+    @staticmethod
+    async def __socket_connect(family: int, type_: int, proto: int, address: Tuple[Any, ...]) -> None:
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            await asyncio.get_event_loop().sock_connect(sock, address)
+        finally:
+            sock.close()
@@ -0,0 +1,131 @@
+"""
+探测工作进程
+
+由 WorkerPool 以独立的 Python 进程启动，只导入协议模块，不加载 NoneBot 插件
+标准输入接收探测请求，标准输出返回结果，每帧为 4 字节长度加 pickle 序列化的元组：
+请求 (请求编号, 协议名称, 服务参数, 超时时间)
+结果 (请求编号, 是否可用, 耗时, 时间戳, 失败原因, 附加信息)
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+import asyncio
+import json
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+
+from nonebot.log import logger
+
+from .protocol import BaseProtocol, SupportProtocol
+from .dns import dns_cache
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+def encode_frame(message: Tuple[Any, ...]) -> bytes:
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def read_frame(stream: BinaryIO) -> Optional[Tuple[Any, ...]]:
+    """
+    阻塞读取一帧，对端关闭时返回 None
+    """
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    data = stream.read(length)
+    if len(data) < length:
+        return None
+    return pickle.loads(data)
+
+
+class ProbeWorker:
+    """
+    工作进程内的探测执行，相同参数的服务复用同一实例，使连接池与 DNS 缓存在探测之间生效
+    """
+
+    def __init__(self, output: BinaryIO, cache_size: int = 4096) -> None:
+        self.__output = output
+        self.__cache_size = cache_size
+        self.__services: OrderedDict[str, BaseProtocol] = OrderedDict()
+        self.__flush_scheduled = False
+
+    def __get_service(self, protocol: str, config: Dict[str, Any]) -> BaseProtocol:
+        key = protocol + json.dumps(config, sort_keys=True, default=str)
+        service = self.__services.get(key)
+        if service is None:
+            service = SupportProtocol.get_protocol(protocol).load_lazy(config)
+            self.__services[key] = service
+            while len(self.__services) > self.__cache_size:
+                self.__services.popitem(last=False)
+        else:
+            self.__services.move_to_end(key)
+        return service
+
+    async def handle(self, request: Tuple[Any, ...]) -> None:
+        request_id, protocol, config, timeout = request
+        try:
+            service = self.__get_service(protocol, config)
+            service.set_timeout(timeout)
+            result = await service.probe()
+            message = (request_id, result.status, result.latency, result.timestamp, result.error, result.detail)
+        except Exception as e:
+            logger.error(f"Worker probe {config.get('name')} failed: {e}")
+            message = (request_id, False, None, time.time(), type(e).__name__, None)
+        self.__output.write(encode_frame(message))
+        # 同一轮事件循环中完成的结果合并为一次写入
+        if not self.__flush_scheduled:
+            self.__flush_scheduled = True
+            asyncio.get_event_loop().call_soon(self.__flush)
+
+    def __flush(self) -> None:
+        self.__flush_scheduled = False
+        self.__output.flush()
+
+
+async def serve(settings: Dict[str, Any], source: BinaryIO, output: BinaryIO) -> None:
+    dns_cache.configure(**settings.get("dns", {}))
+
+    def configure_http(protocol: Any) -> None:
+        from .http import client_pool
+
+        client_pool.configure(**settings.get("http", {}))
+
+    SupportProtocol.on_import("HTTP", configure_http)
+    loop = asyncio.get_event_loop()
+    worker = ProbeWorker(output)
+    closed = asyncio.Event()
+
+    def read_requests() -> None:
+        # 标准输入在线程中阻塞读取，不依赖事件循环对管道的支持
+        while True:
+            request = read_frame(source)
+            if request is None:
+                break
+            loop.call_soon_threadsafe(lambda request=request: asyncio.ensure_future(worker.handle(request)))
+        loop.call_soon_threadsafe(closed.set)
+
+    threading.Thread(target=read_requests, daemon=True).start()
+    await closed.wait()
+    http_module = sys.modules.get(f"{__package__}.http")
+    if http_module is not None:
+        await http_module.client_pool.aclose()
+
+
+def main() -> None:
+    settings = json.loads(sys.argv[2]) if len(sys.argv) > 2 else {}
+    # 结果只写入原标准输出，其余输出（如日志、print）重定向到标准错误，避免混入结果
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    try:
+        asyncio.run(serve(settings, sys.stdin.buffer, output))
+    except KeyboardInterrupt:
+        pass
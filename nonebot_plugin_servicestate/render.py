@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from .protocol import ProbeResult
+
+
+def format_latency(result: ProbeResult) -> Optional[str]:
+    return None if result.latency is None else f"{result.latency * 1000:.0f}ms"
+
+
+def format_result_line(name: str, result: ProbeResult, show_latency: bool) -> str:
+    line = f"O 正常 | {name}" if result else f"X 故障 | {name}"
+    if show_latency and result.latency is not None:
+        line += f" | {format_latency(result)}"
+    return line
+
+
+def format_summary(results: Dict[str, ProbeResult], show_latency: bool) -> str:
+    """
+    只显示正常与故障数量及故障服务
+    """
+    failed = [format_result_line(name, result, show_latency) for name, result in results.items() if not result]
+    return "\n".join([f"{len(results) - len(failed)} 正常 / {len(failed)} 故障"] + failed)
+
+
+class StatusRenderer:
+    """
+    服务状态回复渲染
+
+    故障服务排在前面，按 page_size 行分页，page_size 为 0 时不分页
+    渲染结果按版本缓存，不显示耗时时使用 CommandManager.result_version，显示耗时时使用 latency_version，
+    显示的内容未变化时直接复用
+    """
+
+    def __init__(self, page_size: int = 50) -> None:
+        self.__page_size = page_size
+        self.__cache: Dict[Tuple, Tuple[int, object]] = {}
+
+    @property
+    def page_size(self) -> int:
+        return self.__page_size
+
+    def configure(self, page_size: int = 50) -> None:
+        self.__page_size = page_size
+        self.__cache.clear()
+
+    def __cached(self, version: int, key: Tuple) -> Optional[object]:
+        entry = self.__cache.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def pages(self, version: int, results: Dict[str, ProbeResult], show_latency: bool) -> List[str]:
+        """
+        返回每一页的文本，没有服务时返回空列表
+        """
+        pages = self.__cached(version, ("pages", show_latency))
+        if pages is None:
+            failed = [format_result_line(name, result, show_latency) for name, result in results.items() if not result]
+            lines = failed + [format_result_line(name, result, show_latency) for name, result in results.items() if result]
+            size = self.__page_size if self.__page_size > 0 else max(len(lines), 1)
+            pages = ["\n".join(lines[i : i + size]) for i in range(0, len(lines), size)]
+            self.__cache[("pages", show_latency)] = (version, pages)
+        return pages
+
+    def summary(self, version: int, results: Dict[str, ProbeResult], show_latency: bool) -> str:
+        """
+        只显示正常与故障数量及故障服务
+        """
+        text = self.__cached(version, ("summary", show_latency))
+        if text is None:
+            text = format_summary(results, show_latency)
+            self.__cache[("summary", show_latency)] = (version, text)
+        return text
+
+
+status_renderer = StatusRenderer()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+from nonebot.log import logger
+
+from .cache import ServiceKey
+from .protocol import BaseProtocol
+
+if TYPE_CHECKING:
+    from .manager import CommandManager
+
+
+class ProbeScheduler:
+    """
+    后台探测调度器
+
+    按各服务的 interval 参数在后台探测服务，并将结果写入 CommandManager 的结果缓存
+
+    新发现的服务首次探测时间在一个探测间隔内随机分散，之后每次探测间隔按 jitter 比例随机浮动，避免探测集中在同一时刻
+    待探测的服务按到期时间保存在堆中，每次检查的耗时只与到期的服务数量相关；只在配置变化后重新遍历服务列表
+    """
+
+    # 新发现的服务每次检查最多读取的数量，避免首次检查时一次校验所有服务的参数
+    SYNC_BATCH = 500
+
+    def __init__(self, manager: CommandManager, tick: float = 1.0, jitter: float = 0.1) -> None:
+        self.__manager = manager
+        self.__tick = tick
+        self.__jitter = jitter
+        # (到期时间, 序号, 服务键, 服务, 是否已按探测间隔安排)
+        self.__heap: List[Tuple[float, int, ServiceKey, BaseProtocol, bool]] = []
+        self.__sequence = itertools.count()
+        # 每个服务当前有效的堆记录序号，其余记录出堆时丢弃
+        self.__current: Dict[ServiceKey, int] = {}
+        self.__services: Dict[ServiceKey, BaseProtocol] = {}
+        self.__config_version: Optional[int] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__running: Dict[ServiceKey, asyncio.Task] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        logger.debug("Starting probe scheduler")
+        self.__task = asyncio.get_event_loop().create_task(self.__run())
+
+    async def stop(self) -> None:
+        tasks = list(self.__running.values())
+        if self.__task is not None:
+            tasks.append(self.__task)
+            self.__task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.__running.clear()
+
+    async def __run(self) -> None:
+        while True:
+            try:
+                self.__schedule_due()
+            except Exception as e:
+                logger.error(f"Probe scheduler failed: {e}")
+            await asyncio.sleep(self.__tick)
+
+    def __push(self, due: float, key: ServiceKey, service: BaseProtocol, placed: bool = True) -> None:
+        sequence = next(self.__sequence)
+        self.__current[key] = sequence
+        heapq.heappush(self.__heap, (due, sequence, key, service, placed))
+
+    def __sync(self, now: float) -> None:
+        """
+        配置变化后找出新增、被替换及被删除的服务
+        """
+        version = self.__manager.config_version
+        if version == self.__config_version:
+            return
+        self.__config_version = version
+        services = dict(self.__manager.iter_services())
+        added = 0
+        for key, service in services.items():
+            if self.__services.get(key) is service:
+                continue
+            # 首次出堆时才读取 interval 并安排首次探测
+            self.__push(now + (added // self.SYNC_BATCH) * self.__tick, key, service, False)
+            added += 1
+        for key in self.__services.keys() - services.keys():
+            self.__current.pop(key, None)
+        self.__services = services
+
+    def __schedule_due(self) -> None:
+        now = time.time()
+        self.__sync(now)
+        heap = self.__heap
+        while heap and heap[0][0] <= now:
+            _, sequence, key, service, placed = heapq.heappop(heap)
+            if self.__current.get(key) != sequence or self.__services.get(key) is not service:
+                continue
+            del self.__current[key]
+            if service.interval <= 0:
+                continue
+            if not placed:
+                self.__push(now + random.uniform(0, service.interval), key, service)
+                continue
+            if key in self.__running:
+                self.__push(now + self.__tick, key, service)
+                continue
+            age = self.__manager.get_result_age(key, service)
+            if age is not None and age < service.interval * (1 - self.__jitter):
+                # 结果已被其他途径（如强制刷新）更新，顺延到该结果过期时
+                self.__push(now + service.interval - age, key, service)
+                continue
+            self.__push(now + service.interval * random.uniform(1 - self.__jitter, 1 + self.__jitter), key, service)
+            task = asyncio.get_event_loop().create_task(self.__probe(key, service))
+            self.__running[key] = task
+
+    async def __probe(self, key: ServiceKey, service: BaseProtocol) -> None:
+        try:
+            await self.__manager.probe_service(key, service)
+        except Exception as e:
+            logger.error(f"Background probe {key} failed: {e}")
+        finally:
+            self.__running.pop(key, None)
@@ -1,106 +1,212 @@
 from __future__ import annotations
 
-from typing import Union, Dict, List, Any, Tuple
-from asyncio import gather
+from typing import Union, Dict, List, Any, Tuple, Callable, Awaitable, Optional, Iterator, KeysView
+from asyncio import gather, ensure_future, as_completed
+from functools import partial
 
-from .protocol import BaseProtocol, SupportProtocol
+from .protocol import BaseProtocol, SupportProtocol, ProbeResult
 from .exception import ProtocolUnsopportError, NameConflictError,NameNotFoundError
+from .transaction import UndoLog
 from nonebot.log import logger
 
 
 class ServiceStatus:
     def __init__(self) -> None:
-        self.__bind_services: List[BaseProtocol] = []
+        # 以服务名称为键，保持绑定顺序
+        self.__bind_services: Dict[str, BaseProtocol] = {}
+        # 只读快照，修改时失效，下次遍历时重建
+        self.__snapshot: Optional[Tuple[BaseProtocol, ...]] = None
+        self.__undo_log: Optional[UndoLog] = None
 
     def __contains__(self, item) -> bool:
         if isinstance(item, str):
-            for i in self:
-                if i == item:
-                    return True
-        if isinstance(item, BaseProtocol):
             return item in self.__bind_services
+        if isinstance(item, BaseProtocol):
+            service = self.__bind_services.get(item.name)
+            return service is not None and service == item
         return False
 
-    def __iter__(self) -> ServiceStatus:
-        self.__iterator = self.__bind_services.__iter__()
-        return self
+    def __iter__(self) -> Iterator[BaseProtocol]:
+        return iter(self.snapshot())
+
+    def snapshot(self) -> Tuple[BaseProtocol, ...]:
+        """
+        返回当前服务列表的只读快照，遍历期间的修改不会影响快照
+        """
+        if self.__snapshot is None:
+            self.__snapshot = tuple(self.__bind_services.values())
+        return self.__snapshot
 
-    def __next__(self) -> BaseProtocol:
-        return self.__iterator.__next__()
+    def names(self) -> KeysView[str]:
+        """
+        服务名称的集合视图，可直接进行集合运算
+        """
+        return self.__bind_services.keys()
 
     def __getitem__(self, key: Union[str, BaseProtocol]) -> BaseProtocol:
-        for i in self:
-            if i == key:
-                return i
-        raise NameNotFoundError(key)
+        service = self.__bind_services.get(key if isinstance(key, str) else key.name)
+        if service is None or not service == key:
+            raise NameNotFoundError(key)
+        return service
 
     def __setitem__(self, key: Union[str, BaseProtocol], value: BaseProtocol) -> None:
-        for i, j in enumerate(self.__bind_services):
-            if key == j:
-                self.__bind_services[i] = value
-                return
-        raise NameNotFoundError(key)
+        name = self[key].name
+        if value.name == name:
+            original = self.__bind_services[name]
+            self.__put(name, value)
+            self.__record(lambda: self.__put(name, original))
+            return
+        if value.name in self.__bind_services:
+            raise NameConflictError(value.name)
+        # 重命名时保持原有顺序，原字典不做修改，回滚时直接换回
+        original_services = self.__bind_services
+        self.__set_services(
+            {(value.name if i == name else i): (value if i == name else j) for i, j in original_services.items()}
+        )
+        self.__record(lambda: self.__set_services(original_services))
 
     def __len__(self) -> int:
         return len(self.__bind_services)
 
     def register_service(self, protocol: str, *args, **kw) -> BaseProtocol:
-        if protocol not in SupportProtocol.get():
+        try:
+            protocol_class = SupportProtocol.get_protocol(protocol)
+        except KeyError:
             raise ProtocolUnsopportError
-        target_instance = SupportProtocol.SUPPORT_PROTOCOL[protocol](*args, **kw)
+        target_instance = protocol_class(*args, **kw)
         self.bind_service(target_instance)
         return target_instance
 
     def bind_service(self, service: BaseProtocol) -> BaseProtocol:
-        if service in self:
+        name = service.name
+        if name in self.__bind_services:
             raise NameConflictError
-        self.__bind_services.append(service)
+        self.__put(name, service)
+        self.__record(lambda: self.__remove(name))
         return service
 
     def unbind_service(self, unbind_service: Union[BaseProtocol, str]) -> BaseProtocol:
         if unbind_service not in self:
             raise NameNotFoundError
-        if isinstance(unbind_service, str):
-            unbind_service = self[unbind_service]
-        self.__bind_services.pop(self.__bind_services.index(unbind_service))
-        return unbind_service
+        name = unbind_service if isinstance(unbind_service, str) else unbind_service.name
+        position = list(self.__bind_services).index(name) if self.__undo_log is not None else 0
+        service = self.__remove(name)
+        self.__record(lambda: self.__insert(position, name, service))
+        return service
 
-    async def get_detect_result(self) -> Dict[str, bool]:
-        tasks = [service.detect() for service in self]
-        result = await gather(*tasks)
+    def begin(self, undo_log: UndoLog) -> None:
+        """
+        开始事务，之后的每次修改都会向 undo_log 记录对应的撤销操作
+        """
+        self.__undo_log = undo_log
+
+    def end(self) -> None:
+        """
+        结束事务，不再记录撤销操作
+        """
+        self.__undo_log = None
+
+    def __record(self, action: Callable[[], None]) -> None:
+        if self.__undo_log is not None:
+            self.__undo_log.push(action)
+
+    def __set_services(self, services: Dict[str, BaseProtocol]) -> None:
+        self.__bind_services = services
+        self.__snapshot = None
+
+    def __put(self, name: str, service: BaseProtocol) -> None:
+        self.__bind_services[name] = service
+        self.__snapshot = None
+
+    def __remove(self, name: str) -> BaseProtocol:
+        self.__snapshot = None
+        return self.__bind_services.pop(name)
+
+    def __insert(self, position: int, name: str, service: BaseProtocol) -> None:
+        if position >= len(self.__bind_services):
+            self.__put(name, service)
+            return
+        items = list(self.__bind_services.items())
+        items.insert(position, (name, service))
+        self.__set_services(dict(items))
+
+    async def get_detect_result(
+        self,
+        detector: Optional[Callable[[BaseProtocol], Awaitable[ProbeResult]]] = None,
+    ) -> Dict[str, ProbeResult]:
+        if detector is None:
+            detector = lambda service: service.probe()
+        services = self.snapshot()
+        result = await gather(*[detector(service) for service in services])
         ret_dict = {}
-        for i, j in zip(self, result):
+        for i, j in zip(services, result):
             ret_dict[i.name] = j
         return ret_dict
 
+    async def get_verdict(
+        self,
+        detector: Optional[Callable[[BaseProtocol], Awaitable[ProbeResult]]] = None,
+    ) -> ProbeResult:
+        """
+        同时探测所有服务，全部可用时返回可用结果，耗时取最慢的服务
+
+        任一服务故障时立即返回该服务的故障结果，并取消其余尚未完成的探测
+        """
+        if detector is None:
+            detector = lambda service: service.probe()
+        tasks = [ensure_future(detector(service)) for service in self.snapshot()]
+        verdict = ProbeResult(True, 0.0)
+        try:
+            for next_done in as_completed(tasks):
+                result = await next_done
+                if not result:
+                    return result
+                if result.latency is not None and result.latency > verdict.latency:
+                    verdict.latency = result.latency
+                if verdict.timestamp is None or (result.timestamp or 0) > verdict.timestamp:
+                    verdict.timestamp = result.timestamp
+            return verdict
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
     @classmethod
     def load(cls, source: Dict[str, List]) -> ServiceStatus:
+        """
+        从配置载入，只导入配置中出现的协议，服务参数在首次使用时才校验
+        """
         instance = cls()
         for key, value in source.items():
             # logger.debug(f"Loading protocol {key} with {value}")
-            if key not in SupportProtocol.get():
+            if not value:
+                continue
+            try:
+                protocol = SupportProtocol.get_protocol(key)
+            except KeyError:
                 logger.error(f"Unsopported protocol: {key} !")
                 logger.warning(f"Protocol {key} will ignored from loading")
                 continue
             for this_service_config in value:
-                this_service_instance = SupportProtocol.SUPPORT_PROTOCOL[key].load(this_service_config)
-                instance.bind_service(this_service_instance)
+                instance.bind_service(protocol.load_lazy(this_service_config))
         return instance
 
     def export(self) -> Dict[str, List[Dict]]:
-        ret_dict = {}
-        for i in SupportProtocol.get():
-            ret_dict[i] = []
-            for j in self:
-                if j._PROTOCOL_NAME != i:
-                    continue
-                ret_dict[i].append(j.export())
+        ret_dict: Dict[str, List[Dict]] = {i: [] for i in SupportProtocol.get()}
+        for i in self:
+            ret_dict.setdefault(i._PROTOCOL_NAME, []).append(i.export())
         return ret_dict
 
 
 class ServiceStatusGroup:
     def __init__(self) -> None:
         self.__bind_services_group: Dict[str, ServiceStatus] = {}
+        # 只读快照，修改时失效，下次遍历时重建
+        self.__snapshot: Optional[Tuple[Tuple[str, ServiceStatus], ...]] = None
+        self.__snapshot_values: Optional[Tuple[ServiceStatus, ...]] = None
+        self.__undo_log: Optional[UndoLog] = None
+        # 事务期间被访问过的群组，事务结束时一并结束
+        self.__enrolled: List[ServiceStatus] = []
 
     def __contains__(self, item) -> bool:
         if isinstance(item, str):
@@ -109,16 +215,15 @@ class ServiceStatusGroup:
             return item in self.__bind_services_group.values()
         return False
 
-    def __iter__(self) -> ServiceStatusGroup:
-        self.__iterator = self.__bind_services_group.values().__iter__()
-        return self
-
-    def __next__(self) -> ServiceStatus:
-        return self.__iterator.__next__()
+    def __iter__(self) -> Iterator[ServiceStatus]:
+        self.items()
+        return iter(self.__snapshot_values)
 
     def __getitem__(self, key: Union[str, ServiceStatus]) -> ServiceStatus:
         if isinstance(key, str):
-            return self.__bind_services_group[key]
+            if key not in self.__bind_services_group:
+                raise NameNotFoundError(key)
+            return self.__enroll(self.__bind_services_group[key])
         for i in self:
             if i == key:
                 return i
@@ -126,50 +231,118 @@ class ServiceStatusGroup:
 
     def __setitem__(self, key: Union[str, ServiceStatus], value: ServiceStatus) -> None:
         if isinstance(key, str):
-            key = self[key]
+            if key not in self.__bind_services_group:
+                raise NameNotFoundError(key)
+            self.__replace(key, value)
+            return
         for i, j in self.items():
             if key == j:
-                self.__bind_services_group[i] = value
+                self.__replace(i, value)
                 return
         raise NameNotFoundError (key)
 
     def __len__(self):
         return len(self.__bind_services_group)
 
-    def items(self):
-        return self.__bind_services_group.items()
+    def names(self) -> KeysView[str]:
+        """
+        群组名称的集合视图，可直接进行集合运算
+        """
+        return self.__bind_services_group.keys()
+
+    def items(self) -> Tuple[Tuple[str, ServiceStatus], ...]:
+        """
+        返回 (群组名称, 群组) 的只读快照，遍历期间的修改不会影响快照
+        """
+        if self.__snapshot is None:
+            self.__snapshot = tuple(self.__bind_services_group.items())
+            self.__snapshot_values = tuple(self.__bind_services_group.values())
+        return self.__snapshot
+
+    def __changed(self) -> None:
+        self.__snapshot = None
+        self.__snapshot_values = None
 
     def bind_group(
         self,
         services: List[BaseProtocol],
         name: str,
     ) -> None:
-        self.__bind_services_group[name] = ServiceStatus()
+        new_group = ServiceStatus()
         for this_service in services:
-            self.__bind_services_group[name].bind_service(this_service)
+            new_group.bind_service(this_service)
+        self.__replace(name, new_group)
 
     def unbind_group(self, key: str) -> ServiceStatus:
         if key not in self:
             raise NameNotFoundError
-        temp_ret = self.__bind_services_group[key]
-        del self.__bind_services_group[key]
+        position = list(self.__bind_services_group).index(key) if self.__undo_log is not None else 0
+        temp_ret = self.__bind_services_group.pop(key)
+        self.__changed()
+        self.__record(lambda: self.__insert(position, key, temp_ret))
         return temp_ret
 
-    async def get_detect_result(self) -> Dict[str, bool]:
-        ret_result = {}
-        for name, this_service_group in self.items():
-            ret_result[name] = True
-            for i in (await this_service_group.get_detect_result()).values():
-                if not i:
-                    ret_result[name] = False
-                    break
-        return ret_result
+    def begin(self, undo_log: UndoLog) -> None:
+        """
+        开始事务，之后对群组及群组内服务的修改都会向 undo_log 记录对应的撤销操作
+        """
+        self.__undo_log = undo_log
+
+    def end(self) -> None:
+        """
+        结束事务，不再记录撤销操作
+        """
+        self.__undo_log = None
+        for i in self.__enrolled:
+            i.end()
+        self.__enrolled.clear()
+
+    def __enroll(self, service_status: ServiceStatus) -> ServiceStatus:
+        if self.__undo_log is not None and service_status not in self.__enrolled:
+            service_status.begin(self.__undo_log)
+            self.__enrolled.append(service_status)
+        return service_status
+
+    def __record(self, action: Callable[[], None]) -> None:
+        if self.__undo_log is not None:
+            self.__undo_log.push(action)
+
+    def __replace(self, name: str, value: Optional[ServiceStatus]) -> None:
+        """
+        替换或新增群组，value 为 None 时删除群组
+        """
+        original = self.__bind_services_group.get(name)
+        if value is None:
+            self.__bind_services_group.pop(name, None)
+        else:
+            self.__bind_services_group[name] = value
+        self.__changed()
+        self.__record(lambda: self.__replace(name, original))
+
+    def __insert(self, position: int, name: str, value: ServiceStatus) -> None:
+        items = list(self.__bind_services_group.items())
+        items.insert(position, (name, value))
+        self.__bind_services_group = dict(items)
+        self.__changed()
+
+    async def get_detect_result(
+        self,
+        detector: Optional[Callable[[str, BaseProtocol], Awaitable[ProbeResult]]] = None,
+    ) -> Dict[str, ProbeResult]:
+        group_items = self.items()
+        tasks = []
+        for name, this_service_group in group_items:
+            group_detector = None if detector is None else partial(detector, name)
+            tasks.append(this_service_group.get_verdict(group_detector))
+        result = await gather(*tasks)
+        return dict(zip((name for name, _ in group_items), result))
 
     @classmethod
     def load(cls, source: Dict[str, Dict[str, List]]) -> ServiceStatusGroup:
         instance = cls()
         for name, service_status_config in source.items():
             instance.__bind_services_group[name] = ServiceStatus.load(service_status_config)
+        instance.__changed()
         return instance
 
     def export(self) -> Dict[str, Dict[str, List]]:
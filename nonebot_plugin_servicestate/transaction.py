@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from typing import Callable, List
+
+
+class UndoLog:
+    """
+    事务撤销日志
+
+    事务期间每次修改记录一个撤销操作，回滚时按相反顺序执行，耗时只与修改次数相关
+    """
+
+    def __init__(self) -> None:
+        self.__actions: List[Callable[[], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.__actions)
+
+    def push(self, action: Callable[[], None]) -> None:
+        self.__actions.append(action)
+
+    def undo(self) -> None:
+        while self.__actions:
+            self.__actions.pop()()
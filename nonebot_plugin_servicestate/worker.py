@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Type
+from pathlib import Path
+import asyncio
+import itertools
+import json
+import pickle
+import sys
+import time
+import zlib
+
+from nonebot.log import logger
+
+from .protocol import BaseProtocol, ProbeResult, SupportProtocol
+from .protocol.worker import FRAME_HEADER, encode_frame
+
+# 插件包的 __init__ 会注册 NoneBot 插件，工作进程以空的包模块代替后只导入协议模块
+_BOOTSTRAP = f"""\
+import sys, types
+package = types.ModuleType({__package__!r})
+package.__path__ = [sys.argv[1]]
+sys.modules[package.__name__] = package
+from {__package__}.protocol.worker import main
+main()
+"""
+
+
+class _Worker:
+    __slots__ = ("index", "process", "reader_task", "write_lock", "pending", "alive")
+
+    def __init__(self, index: int, process: asyncio.subprocess.Process) -> None:
+        self.index = index
+        self.process = process
+        self.reader_task: Optional[asyncio.Task] = None
+        self.write_lock = asyncio.Lock()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.alive = True
+
+
+class WorkerPool:
+    """
+    探测工作进程池
+
+    按服务名称的 crc32 将服务固定分配到 workers 个工作进程，每个进程运行独立的事件循环完成探测，
+    机器人进程只发送请求与合并结果；workers 为 0 或进程池未启动时在机器人进程内探测
+    工作进程意外退出时，等待中的探测返回故障，重新启动前该进程的服务在机器人进程内探测
+    工作进程只能导入 protocol 包中的协议及通过入口点登记的协议，在机器人进程中定义的其他协议始终在机器人进程内探测
+    """
+
+    def __init__(self, workers: int = 0, settings: Optional[Dict[str, Any]] = None) -> None:
+        self.__worker_count = workers
+        self.__settings = settings or {}
+        self.__workers: List[_Worker] = []
+        self.__request_id = itertools.count()
+        self.__running = False
+        self.__remote_protocols: Dict[Type[BaseProtocol], bool] = {}
+
+    def configure(self, workers: int = 0, settings: Optional[Dict[str, Any]] = None) -> None:
+        """
+        设置进程数及传给工作进程的连接池、DNS 缓存参数，在 start 前调用
+        """
+        self.__worker_count = workers
+        self.__settings = settings or {}
+
+    @property
+    def is_running(self) -> bool:
+        return self.__running
+
+    def __len__(self) -> int:
+        return len(self.__workers)
+
+    def shard(self, name: str) -> int:
+        return zlib.crc32(name.encode("utf-8")) % len(self.__workers)
+
+    async def start(self) -> None:
+        if self.__running or self.__worker_count <= 0:
+            return
+        try:
+            for i in range(self.__worker_count):
+                self.__workers.append(await self.__spawn(i))
+        except NotImplementedError:
+            # 部分 Windows 事件循环不支持子进程
+            logger.warning("Probe workers require an event loop with subprocess support, probing in process")
+            await self.stop()
+            return
+        self.__running = True
+        logger.info(f"Started {self.__worker_count} probe workers")
+
+    async def __spawn(self, index: int) -> _Worker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-c",
+            _BOOTSTRAP,
+            str(Path(__file__).resolve().parent),
+            json.dumps(self.__settings),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        worker = _Worker(index, process)
+        worker.reader_task = asyncio.ensure_future(self.__read_results(worker))
+        return worker
+
+    async def stop(self) -> None:
+        self.__running = False
+        workers, self.__workers = self.__workers, []
+        for worker in workers:
+            if worker.process.stdin is not None:
+                worker.process.stdin.close()
+        for worker in workers:
+            try:
+                await asyncio.wait_for(worker.process.wait(), 5)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+                await worker.process.wait()
+            if worker.reader_task is not None:
+                await asyncio.gather(worker.reader_task, return_exceptions=True)
+
+    async def __read_results(self, worker: _Worker) -> None:
+        stdout = worker.process.stdout
+        try:
+            while True:
+                header = await stdout.readexactly(FRAME_HEADER.size)
+                (length,) = FRAME_HEADER.unpack(header)
+                request_id, *result = pickle.loads(await stdout.readexactly(length))
+                future = worker.pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result(ProbeResult(*result))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        worker.alive = False
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_result(ProbeResult(False, timestamp=time.time(), error="WorkerExited"))
+        worker.pending.clear()
+        if self.__running and worker in self.__workers:
+            logger.error(f"Probe worker {worker.index} exited with {await worker.process.wait()}, restarting")
+            await asyncio.sleep(1)
+            if self.__running and worker in self.__workers:
+                self.__workers[worker.index] = await self.__spawn(worker.index)
+
+    def supports(self, protocol: Type[BaseProtocol]) -> bool:
+        """
+        工作进程能否导入该协议
+        """
+        remote = self.__remote_protocols.get(protocol)
+        if remote is None:
+            remote = protocol.__module__.startswith(f"{__package__}.protocol.") or (
+                protocol._PROTOCOL_NAME in SupportProtocol.discover()
+            )
+            self.__remote_protocols[protocol] = remote
+        return remote
+
+    async def probe(self, service: BaseProtocol) -> ProbeResult:
+        if not self.__running or not self.supports(type(service)):
+            return await service.probe()
+        worker = self.__workers[self.shard(service.name)]
+        if not worker.alive:
+            return await service.probe()
+        request_id = next(self.__request_id)
+        future = asyncio.get_event_loop().create_future()
+        worker.pending[request_id] = future
+        try:
+            async with worker.write_lock:
+                worker.process.stdin.write(
+                    encode_frame((request_id, service._PROTOCOL_NAME, service.export(), service.timeout))
+                )
+                await worker.process.stdin.drain()
+            # 工作进程内的探测已受超时限制，此处只防止工作进程卡死
+            return await asyncio.wait_for(future, service.timeout + 5)
+        except asyncio.TimeoutError:
+            return ProbeResult(False, timestamp=time.time(), error="WorkerTimeout")
+        except (ConnectionError, RuntimeError) as e:
+            return ProbeResult(False, timestamp=time.time(), error=type(e).__name__)
+        finally:
+            worker.pending.pop(request_id, None)
+
+
+worker_pool = WorkerPool()
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import nonebot
+
+# 插件数据目录指向临时目录，避免读写真实配置
+DATA_DIR = Path(tempfile.mkdtemp(prefix="servicestate-test-"))
+os.environ["XDG_DATA_HOME"] = str(DATA_DIR)
+os.environ["LOCALSTORE_DATA_DIR"] = str(DATA_DIR)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+nonebot.init()
+nonebot.load_plugin("nonebot_plugin_servicestate")
@@ -0,0 +1,25 @@
+import pytest
+
+from nonebot_plugin_servicestate import get_data_file_path, read_data_file, write_data_file
+from nonebot_plugin_servicestate.manager import PLUGIN_CONFIG_FILE_PATH, PROBE_HISTORY_FILE_PATH
+
+
+@pytest.mark.parametrize("file_name", ["probe_history.log", "protocol_settings.json.journal"])
+def test_export_does_not_overwrite_plugin_files(file_name):
+    owned = PLUGIN_CONFIG_FILE_PATH.parent / file_name
+    owned.write_text("plugin data", encoding="utf-8")
+    path = write_data_file(file_name, "[]")
+    assert path != owned
+    assert owned.read_text(encoding="utf-8") == "plugin data"
+    assert read_data_file(file_name) == "[]"
+
+
+@pytest.mark.parametrize("file_name", ["", ".", "..", "../probe_history.log", "exports/../protocol_settings.json"])
+def test_invalid_data_file_name(file_name):
+    with pytest.raises(ValueError):
+        get_data_file_path(file_name)
+
+
+def test_plugin_files_outside_export_directory():
+    assert get_data_file_path(PROBE_HISTORY_FILE_PATH.name) != PROBE_HISTORY_FILE_PATH
+    assert get_data_file_path(PLUGIN_CONFIG_FILE_PATH.name) != PLUGIN_CONFIG_FILE_PATH
@@ -0,0 +1,53 @@
+import asyncio
+import socket
+
+from nonebot_plugin_servicestate.manager import history_store, manager
+
+
+def closed_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_slow_http_server(delay: float) -> asyncio.AbstractServer:
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.readuntil(b"\r\n\r\n")
+        await asyncio.sleep(delay)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok")
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def test_cancelled_group_member_result_is_recorded():
+    async def main() -> None:
+        server = await start_slow_http_server(0.3)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            manager.load_dict(
+                {
+                    "service": {},
+                    "service_group": {
+                        "grp": {
+                            "HTTP": [{"name": "slow", "host": f"http://127.0.0.1:{port}/", "timeout": 2}],
+                            "TCP": [{"name": "dead", "host": "127.0.0.1", "port": closed_port(), "timeout": 2}],
+                        }
+                    },
+                }
+            )
+            result = await manager.get_detect_result(force=True)
+            # 故障成员使群组立即返回故障，慢速成员的探测此时尚未完成
+            assert not result["grp"]
+            await asyncio.sleep(0.6)
+            services = dict(manager.iter_services())
+            key = ("grp", "slow")
+            assert manager.get_result_age(key, services[key]) is not None
+            assert history_store.stats(key, 3600).count == 1
+            assert history_store.stats(key, 3600).up_count == 1
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())